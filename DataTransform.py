@@ -1,22 +1,51 @@
+import copy
+from contextlib import nullcontext
+from functools import partial
+import numpy as np
 import pandas as pd
 #file path utils for 
-from utils.data_loader import load_csv
+from utils.data_loader import load_dataset, load_csv_chunks, compact_dataframe
 from utils.Imputer import transform_dataset
-from utils.time_utils import categorize_time
-from features.speed import average_speed_per_id
-from features.acceleration import acceleration_per_id
-from features.rot import rot_per_id
+from utils.time_utils import normalize_time, NORMALIZED_ATTR
+from features.kinematics import kinematics_per_id
 from features.trajectory import trajectory
 from features.distance_and_straightness import _compute_total_and_straightness_metrics
 from features.max_spatial_spread import compute_max_spatial_spread
 from features.curvature import curvature_results
 from features.stops import count_stops
-from utils.cache_utils import save_cache,load_cache
+from features.feature_state import FeatureState
+from features.registry import FeatureContext, plan
+from utils.cache_utils import FeatureCache, file_fingerprint, cache_key
+from utils.trajectory_frame import TrajectoryFrame
+from utils.spatial_index import GridIndex
+from utils.parallel import run_partitioned
+from utils.instrumentation import ExtractionReport
+
+#Feature families in the column order of get_all_features, every one is a table with one row per id
+FEATURE_FAMILIES = ('kinematics','trajectory','distance','spread','curvature','stops')
+MODE_FAMILIES = {
+    'statistical': ('kinematics','curvature'),
+    'per_se': ('trajectory','distance','spread','stops'),
+    'all': FEATURE_FAMILIES
+}
+#Default parameters of the families that have some (copied to every transformer as feature_params)
+FEATURE_PARAMS = {
+    'distance': {'method': 'haversine'},
+    'spread': {'method': 'haversine'},
+    'curvature': {'mode': 'fixed', 'tol': 1e-3, 'n': 100_000},
+    'stops': {'stop_speed_threshold': 0.5, 'min_stop_duration': 300}
+}
+
+#compact=True feature tolerance: |compact - full| <= COMPACT_RTOL * max |feature| of the column.
+#Speed/heading features round through float32 (~7 significant digits), lat/lon based ones are unchanged;
+#a speed within float32 rounding of stop_speed_threshold can still flip a stop
+COMPACT_RTOL = 1e-6
 
 class DataTransformer:
     def __init__(self,dataset_path,time_col='t',id_col='shipid',speed_col='speed',
                  heading_col='heading',lat_col='lat',lon_col='lon',course_col='course'
-                 ,shiptype_col='shiptype',destination_col='destination',numeric_cols=None,categorical_cols=None):
+                 ,shiptype_col='shiptype',destination_col='destination',numeric_cols=None,categorical_cols=None,
+                 time_format=None,compact=False):
         
         self.dataset_path= dataset_path
         self.data = None
@@ -31,88 +60,407 @@ class DataTransformer:
         self.destination_col=destination_col
         self.numeric_cols = numeric_cols
         self.categorical_cols=categorical_cols
+        #format of the time column: 'iso', 'epoch_s', 'epoch_ms', ..., a strptime format or None to detect it
+        self.time_format=time_format
+        #categorical ids/strings and float32 speed/heading/course (lat/lon stay float64), see COMPACT_RTOL
+        self.compact=compact
+        self.feature_params = copy.deepcopy(FEATURE_PARAMS)
+        #per-ship aggregate state and feature table kept by update()
+        self.state = None
+        self.features = None
+        #id -> sorted time/speed/heading/lat/lon arrays of the ship, so update() recomputes curvature
+        #from its track only and rebuilds the state of ships that get older pings
+        self._tracks = None
+        #what was done to self.data after reading the file, part of the cache key
+        self.data_ops = []
+        #ExtractionReport of the last instrumented extract_features
+        self.last_report = None
+        self._report = None
+
+    @property
+    def data(self):
+        #rows added by update() are concatenated here, once, not on every update
+        if self._appended:
+            self._data = _concat_rows([self._data,*self._appended],self.time_col)
+            self._appended = []
+        return self._data
+
+    @data.setter
+    def data(self,data):
+        self._data = data
+        self._appended = []
+        self._tracks = None
+
+    #Columns named in the constructor, the only ones that get loaded
+    def _columns(self):
+        columns = [self.time_col,self.id_col,self.speed_col,self.heading_col,self.lat_col,self.lon_col,
+                   self.course_col,self.shiptype_col,self.destination_col]
+        columns += (self.numeric_cols or []) + (self.categorical_cols or [])
+        return [col for col in dict.fromkeys(columns) if col is not None]
+
+    def load_data(self,downcast=False):
+        """
+        Supports CSV, Parquet and Feather/Arrow IPC files.
+        downcast: float32 numeric columns (lat/lon stay float64) and categorical strings
+        """
+        self.data = load_dataset(self.dataset_path,columns=self._columns(),time_col=self.time_col,
+                                 downcast=downcast,keep_float64=(self.lat_col,self.lon_col),time_format=self.time_format)
+        if self.compact:
+            self._compact(self.data)
+        self.data_ops = [self._load_op(downcast)]
 
-    def load_data(self):
-        self.data = load_csv(self.dataset_path)
+    def _load_op(self,downcast=False):
+        return ('load', {'downcast': downcast, 'compact': self.compact})
     
-    def transfrom_dataset(self):
+    def transfrom_dataset(self,method='global'):
+        """
+        method: 'global' (column mean / most frequent value) | 'group' (same per ship)
+                | 'ffill' (previous value of the ship in time), see utils.Imputer
+        """
         if self.data is None:
             raise ValueError('No data loaded')
-        self.data = transform_dataset(self.data,numeric_columns=self.numeric_cols,categoriclal_columns=self.categorical_cols)
+        self.data = transform_dataset(self.data,numeric_columns=self.numeric_cols,categoriclal_columns=self.categorical_cols,
+                                      method=method,group_col=self.id_col,time_col=self.time_col)
+        self.data_ops.append(('impute', {'numeric': self.numeric_cols, 'categorical': self.categorical_cols, 'method': method}))
     
+    def _compact(self,data):
+        return compact_dataframe(data,float32=(self.speed_col,self.heading_col,self.course_col),exclude=(self.time_col,))
+
     def exist_null(self):
         return [(col,self.data[col].isnull().sum()) for col in self.data.columns if self.data[col].isnull().sum() >0 ] or None
 
+    #copy of the transformer without the dataset, cheap to send to worker processes
+    def _without_data(self):
+        transformer = copy.copy(self)
+        transformer.data = None
+        transformer.state = None
+        transformer.features = None
+        #the report holds the user's hooks, which may not pickle (lambdas, local functions)
+        transformer._report = None
+        transformer.last_report = None
+        return transformer
+
+    #Sorts by (id,time) and parses the time column once, every feature function reuses it
+    def trajectory_frame(self):
+        if self.data is None:
+            raise ValueError('No data loaded')
+        return self._frame_of(self.data)
+
+    def spatial_index(self,cell_size=0.1,frame=None):
+        """
+        GridIndex of the pings (cell_size in degrees) for region queries, e.g. the features
+        of the ships that passed through a box in a time window:
+            index = dt.spatial_index()
+            groups = index.query_bbox(37.5,23.3,38.0,23.8,start='2024-01-01',end='2024-01-02')
+            dt.extract_features(frame=index.select(groups))
+        """
+        frame = frame if frame is not None else self.trajectory_frame()
+        return GridIndex.from_frame(frame,self.lat_col,self.lon_col,cell_size=cell_size)
+
     #Returns a DataFrame with some statistical features for every ID
-    def statistical_measures(self):
-         speed = average_speed_per_id(self.data,self.id_col,self.time_col,self.speed_col)
-         acceleration = acceleration_per_id(self.data,self.time_col,self.id_col,self.speed_col)
-         rot = rot_per_id(self.data,self.heading_col,self.id_col,self.time_col)
-         curvature = curvature_results(self.data,self.id_col,self.time_col,self.lat_col,self.lon_col)
-
-         return (
-              speed.merge(acceleration,on=self.id_col)
-              .merge(rot,on=self.id_col)
-              .merge(curvature,on=self.id_col)
-         )
+    def statistical_measures(self,frame=None):
+         return self._merge_families(frame,MODE_FAMILIES['statistical'])
     #Returns DataFrame with features per se
-    def features_per_se(self):
-         traj = trajectory(self.data,self.id_col,self.time_col,self.lat_col,self.lon_col)
-         distance_metrics = _compute_total_and_straightness_metrics(self.data,self.id_col,self.time_col,self.lat_col,self.lon_col)
-         max_spatial_spread = compute_max_spatial_spread(self.data,self.id_col,self.time_col,self.lat_col,self.lon_col)
-         stop = count_stops(self.data,self.id_col,self.time_col,self.lat_col,self.lon_col,self.speed_col)
-         return (
-              traj.merge(distance_metrics,on=self.id_col)
-              .merge(max_spatial_spread,on=self.id_col)
-              .merge(stop,on=self.id_col)
-         )
-
-    def extract_features(self,mode='all'):
+    def features_per_se(self,frame=None):
+         return self._merge_families(frame,MODE_FAMILIES['per_se'])
+
+    def feature_family(self,family,frame=None):
+        """
+        Computes one of the FEATURE_FAMILIES with its feature_params
+        """
+        frame = frame if frame is not None else self.trajectory_frame()
+        params = self.feature_params.get(family,{})
+        if family == 'kinematics':
+            #speed, acceleration and rot in one pass
+            return kinematics_per_id(frame,self.id_col,self.time_col,self.speed_col,self.heading_col)
+        if family == 'trajectory':
+            return trajectory(frame,self.id_col,self.time_col,self.lat_col,self.lon_col)
+        if family == 'distance':
+            return _compute_total_and_straightness_metrics(frame,self.id_col,self.time_col,self.lat_col,self.lon_col,**params)
+        if family == 'spread':
+            return compute_max_spatial_spread(frame,self.id_col,self.time_col,self.lat_col,self.lon_col,**params)
+        if family == 'curvature':
+            return curvature_results(frame,self.id_col,self.time_col,self.lat_col,self.lon_col,**params)
+        if family == 'stops':
+            return count_stops(frame,self.id_col,self.time_col,self.lat_col,self.lon_col,self.speed_col,**params)
+        raise ValueError(f"Unknown feature family {family}. Choose from: {FEATURE_FAMILIES}")
+
+    def _merge_families(self,frame,families):
+        frame = frame if frame is not None else self.trajectory_frame()
+        tables = []
+        for family in families:
+            with self._stage(family,rows=frame.n_rows,groups=frame.n_groups):
+                tables.append(self.feature_family(family,frame))
+        with self._stage('merge',rows=frame.n_groups,groups=frame.n_groups):
+            return _merge_tables(tables,self.id_col)
+
+    def extract_features(self,mode='all',n_workers=1,columns=None,instrument=False,hooks=None,frame=None):
         """
         mode: 'all' | 'statistical' | 'per_se'
+        n_workers: number of processes, ships are partitioned by id between them
+        columns: list of output columns (e.g. ['avg_speed','total_distance_km','num_stops']),
+                 overrides mode and computes only what these columns need
+        instrument: time and memory of every stage (sorting, every feature, merging) are kept
+                    in self.last_report, True or an ExtractionReport to use
+                    (e.g. ExtractionReport(memory=False), tracemalloc slows the python loops down)
+        hooks: callables getting every stage record as it ends (turns instrument on)
+        frame: TrajectoryFrame to use instead of self.data (e.g. frame.select of some ships)
         Returns the selected feature set.
         """
+        if columns is None and mode not in ("statistical","per_se","all"):
+            raise ValueError("Invalid mode. Choose from: 'all', 'statistical', or 'per_se'")
+        if isinstance(instrument,ExtractionReport):
+            instrument.hooks.extend(hooks or ())
+            self.last_report = self._report = instrument
+        elif instrument or hooks:
+            self.last_report = self._report = ExtractionReport(hooks=hooks or ())
+        try:
+            return self._extract(mode,n_workers,columns,frame)
+        finally:
+            self._report = None
+
+    def _extract(self,mode,n_workers,columns,frame=None):
+        if columns is not None:
+            _, _, roles = plan(columns)
+            if frame is None:
+                with self._stage('trajectory_frame',rows=self._n_rows()):
+                    frame = self._frame_of(self.data,[self._roles()[role] for role in roles])
+            if n_workers > 1:
+                with self._stage('run_partitioned',rows=frame.n_rows,groups=frame.n_groups):
+                    return run_partitioned(frame,partial(_columns_shard,self._without_data(),list(columns)),n_workers)
+            return FeatureContext(frame,self._roles(),self.feature_params,stage=self._stage).compute(columns)
+        if frame is None:
+            with self._stage('trajectory_frame',rows=self._n_rows()):
+                frame = self.trajectory_frame()
+        if n_workers > 1:
+            #workers are not instrumented, only the whole parallel run
+            with self._stage('run_partitioned',rows=frame.n_rows,groups=frame.n_groups):
+                return run_partitioned(frame,partial(_extract_shard,self._without_data(),mode),n_workers)
+        return self._extract_from_frame(frame,mode)
+
+    #records the block in the report of the running extract_features, if instrumented
+    def _stage(self,name,rows=None,groups=None):
+        if self._report is None:
+            return nullcontext()
+        return self._report.measure(name,rows=rows,groups=groups)
+
+    def _n_rows(self):
+        return None if self.data is None else len(self.data)
+
+    #input role of the feature registry -> column name
+    def _roles(self):
+        return {'speed': self.speed_col,'heading': self.heading_col,'lat': self.lat_col,'lon': self.lon_col}
+
+    def _extract_from_frame(self,frame,mode):
         if mode == "statistical":
-            return self.statistical_measures()
+            return self.statistical_measures(frame)
         elif mode == "per_se":
-            return self.features_per_se()
-        elif mode == "all":
-            return self.get_all_features()
-        else:
-            raise ValueError("Invalid mode. Choose from: 'all', 'statistical', or 'per_se'")
+            return self.features_per_se(frame)
+        return self.get_all_features(frame)
         
     """
     implemented to put and save the data to cached file
     to save time with the calculations
     """
-    def get_cached_features(self,mode='all',cache_path='cache/features_all.pkl'):
-        features = load_cache(cache_path)
-        if features is not None:
+    def get_cached_features(self,mode='all',cache_dir='cache/features',n_workers=1,content_hash=False,max_bytes=512 * 1024**2):
+        """
+        Every feature family is cached on its own, keyed by the input file (size, mtime and
+        the sha256 of the content if content_hash), what was done to the data after loading,
+        the column names and the family parameters. A change in any of them is a miss, and
+        'statistical'/'per_se'/'all' runs reuse each other's families.
+        The data is loaded only if some family has to be computed.
+        """
+        if mode not in MODE_FAMILIES:
+            raise ValueError("Invalid mode. Choose from: 'all', 'statistical', or 'per_se'")
+        cache = FeatureCache(cache_dir,max_bytes=max_bytes)
+        source = file_fingerprint(self.dataset_path,content_hash=content_hash)
+        keys = {family: self._cache_key(source,family) for family in MODE_FAMILIES[mode]}
+        tables = {family: cache.get(key) for family, key in keys.items()}
+
+        missing = [family for family, table in tables.items() if table is None]
+        if missing:
+            print(f"Computing features: {', '.join(missing)}")
+            if self.data is None:
+                self.load_data()
+            frame = self.trajectory_frame()
+            for family in missing:
+                if n_workers > 1:
+                    tables[family] = run_partitioned(frame,partial(_family_shard,self._without_data(),family),n_workers)
+                else:
+                    tables[family] = self.feature_family(family,frame)
+                cache.put(keys[family],tables[family])
+        else:
             print("Loaded features from cache")
-            return features
+        return _merge_tables([tables[family] for family in MODE_FAMILIES[mode]],self.id_col)
 
-        print("Computing features....")
-        features = self.extract_features(mode=mode)
-        save_cache(features,cache_path)
-        print("Saved features to cache")
-        return features
-    
-    def get_all_features(self):
-        speed = average_speed_per_id(self.data,self.id_col,self.time_col,self.speed_col)
-        acceleration= acceleration_per_id(self.data,self.time_col,self.id_col,self.speed_col)
-        rot = rot_per_id(self.data,self.heading_col,self.id_col,self.time_col)
-        traj = trajectory(self.data,self.id_col,self.time_col,self.lat_col,self.lon_col)
-        distance_metrics = _compute_total_and_straightness_metrics(self.data,self.id_col,self.time_col,self.lat_col,self.lon_col)
-        max_spatial_spread = compute_max_spatial_spread(self.data,self.id_col,self.time_col,self.lat_col,self.lon_col)
-        curvature = curvature_results(self.data,self.id_col,self.time_col,self.lat_col,self.lon_col)
-        stop = count_stops(self.data,self.id_col,self.time_col,self.lat_col,self.lon_col,self.speed_col)
-
-        return (speed.merge(acceleration,on=self.id_col)
-                .merge(rot,on=self.id_col)
-                .merge(traj,on=self.id_col)
-                .merge(distance_metrics,on=self.id_col)
-                .merge(max_spatial_spread,on=self.id_col)
-                .merge(curvature,on=self.id_col)
-                .merge(stop,on=self.id_col)
-                )
-        
+    def _cache_key(self,source,family):
+        columns = {'id': self.id_col,'time': self.time_col,'speed': self.speed_col,
+                   'heading': self.heading_col,'lat': self.lat_col,'lon': self.lon_col,'time_format': self.time_format,
+                   'compact': self.compact}
+        #before loading, the op that the load_data() below will record
+        data_ops = self.data_ops if self.data is not None else [self._load_op()]
+        return cache_key(source,data_ops,columns,family,self.feature_params.get(family,{}))
+
+    def feature_state(self):
+        stops = self.feature_params['stops']
+        return FeatureState(self.id_col,self.time_col,self.speed_col,self.heading_col,self.lat_col,self.lon_col,
+                            stop_speed_threshold=stops['stop_speed_threshold'],min_stop_duration=stops['min_stop_duration'],
+                            method=self.feature_params['distance']['method'],time_format=self.time_format)
+
+    def stream_features(self,chunksize=1_000_000):
+        """
+        Same table as get_all_features, reading the csv chunksize rows at a time and
+        keeping only a small per-ship state between chunks (memory doesn't grow with the file).
+        Pings of a ship must be in time order across chunks (e.g. a time-sorted export),
+        no imputation is done and curvature is NaN since it needs the whole track.
+        """
+        state = self.feature_state()
+        columns = {self.id_col,self.time_col,self.speed_col,self.heading_col,self.lat_col,self.lon_col}
+        for chunk in load_csv_chunks(self.dataset_path,chunksize,columns=columns):
+            state.update(chunk)
+        return state.to_features()
+
+    def update(self,new_rows):
+        """
+        Adds new pings and returns the refreshed feature table. Only the ships in new_rows
+        are recomputed from the per-ship state, the result is the same as get_all_features
+        on all the pings.
+        Pings older than the last one seen for their ship rebuild that ship's state from its
+        whole track when the data is loaded, without data they raise ValueError.
+        Curvature needs the whole track, so it's recomputed for the updated ships from
+        their tracks when the data is loaded and left NaN otherwise.
+        The cost follows the new rows and the tracks of their ships, the new rows are
+        appended to self.data the next time it's used.
+        """
+        frame = None
+        if self._data is not None and self._tracks is None:
+            #first update since the data was set: parse it once and split the tracks
+            normalize_time(self.data,self.time_col,self.time_format)
+            frame = self.trajectory_frame()
+            self._tracks = self._split_tracks(frame)
+        if self.state is None:
+            self.state = self.feature_state()
+            if self._data is not None:
+                frame = frame if frame is not None else self.trajectory_frame()
+                self.state.update(frame)
+                self.features = self._with_curvature(self.state.to_features(),frame)
+        #parse only the new rows with time_format (the old ones keep their parsed times),
+        #before the state sees them so the format isn't guessed again for every update
+        new_rows = normalize_time(new_rows.copy(),self.time_col,self.time_format)
+        updated = pd.Index(new_rows[self.id_col].dropna().unique())
+        if self._data is None:
+            self.state.update(new_rows)
+            fresh = self.state.to_features(updated)
+        else:
+            if self.compact:
+                new_rows = self._compact(new_rows)
+            self._appended.append(new_rows)
+            self.data_ops.append(('update', int(pd.util.hash_pandas_object(new_rows,index=False).sum())))
+            new_frame = self._frame_of(new_rows,self._track_columns())
+            late = self.state.late_ids(new_frame)
+            frame = self._extend_tracks(new_frame)
+            if len(late):
+                #older pings change the diffs, distances and stops in the middle of the track:
+                #these ships start over from their whole (re-sorted) track
+                is_late = pd.Index(new_frame.ids).isin(late)
+                self.state.drop(late)
+                self.state.update(new_frame.select(np.flatnonzero(~is_late)))
+                self.state.update(frame.select(np.flatnonzero(is_late)))
+            else:
+                self.state.update(new_frame)
+            fresh = self._with_curvature(self.state.to_features(updated),frame)
+
+        if self.features is not None:
+            fresh = pd.concat([self.features[~self.features[self.id_col].isin(updated)],fresh])
+        self.features = fresh.sort_values(self.id_col,kind='stable').reset_index(drop=True)
+        return self.features
+
+    def _track_columns(self):
+        return [self.speed_col,self.heading_col,self.lat_col,self.lon_col]
+
+    def _split_tracks(self,frame):
+        columns = [self.time_col,*self._track_columns()]
+        parts = {col: np.split(frame.arrays[col],frame.offsets[1:-1]) for col in columns}
+        return {tid: {col: parts[col][g] for col in columns} for g, tid in enumerate(frame.ids)}
+
+    #appends the pings of new_frame to the tracks of their ships, returns the frame of those tracks
+    def _extend_tracks(self,new_frame):
+        columns = list(new_frame.arrays)
+        tracks = []
+        for g, tid in enumerate(new_frame.ids):
+            rows = slice(new_frame.offsets[g],new_frame.offsets[g + 1])
+            track = {col: new_frame.arrays[col][rows] for col in columns}
+            old = self._tracks.get(tid)
+            if old is not None:
+                late = old[self.time_col][-1] > track[self.time_col][0]
+                track = {col: np.concatenate((old[col],track[col])) for col in columns}
+                if late:
+                    #pings older than the ones seen, same order as sorting all of them
+                    order = np.argsort(track[self.time_col],kind='stable')
+                    track = {col: values[order] for col, values in track.items()}
+            self._tracks[tid] = track
+            tracks.append(track)
+        offsets = np.r_[0,np.cumsum([len(track[self.time_col]) for track in tracks])].astype(np.int64)
+        arrays = {col: np.concatenate([track[col] for track in tracks]) if tracks else new_frame.arrays[col] for col in columns}
+        return TrajectoryFrame(self.id_col,self.time_col,new_frame.ids,offsets,arrays)
+
+    def _frame_of(self,data,columns=None):
+        if data is None:
+            raise ValueError('No data loaded')
+        if columns is None:
+            columns = [self.speed_col,self.heading_col,self.course_col,self.lat_col,self.lon_col]
+        return TrajectoryFrame.from_dataframe(data,self.id_col,self.time_col,columns=columns,time_format=self.time_format)
+
+    def _with_curvature(self,features,frame):
+        curvature = self.feature_family('curvature',frame)
+        features = features.drop(columns=curvature.columns.drop(self.id_col))
+        columns = features.columns.insert(features.columns.get_loc('max_spatial_spread') + 1, curvature.columns.drop(self.id_col))
+        return features.merge(curvature,on=self.id_col)[columns]
+
+    def save_state(self,filepath='cache/feature_state.pkl'):
+        if self.state is None:
+            raise ValueError('No state yet, call update() first')
+        self.state.save(filepath)
+
+    def load_state(self,filepath='cache/feature_state.pkl'):
+        self.state = FeatureState.load(filepath)
+        self.features = self.state.to_features()
+        if self.data is not None:
+            self.features = self._with_curvature(self.features,self.trajectory_frame())
+        return self.features
+
+    def get_all_features(self,frame=None):
+        return self._merge_families(frame,MODE_FAMILIES['all'])
+
+
+def _merge_tables(tables,id_col):
+    result = tables[0]
+    for table in tables[1:]:
+        result = result.merge(table,on=id_col)
+    return result
+
+#concatenation of normalized row blocks, categorical columns get the same (sorted) categories
+#in every block so they stay categorical
+def _concat_rows(parts,time_col):
+    for col in parts[0].columns:
+        if all(isinstance(part[col].dtype, pd.CategoricalDtype) for part in parts if col in part.columns):
+            categories = parts[0][col].cat.categories
+            for part in parts[1:]:
+                if col in part.columns:
+                    categories = categories.union(part[col].cat.categories)
+            for part in parts:
+                if col in part.columns:
+                    part[col] = part[col].cat.set_categories(categories)
+    data = pd.concat(parts,ignore_index=True)
+    data.attrs[NORMALIZED_ATTR] = time_col
+    return data
+
+#runs in the worker processes of extract_features(n_workers>1)
+def _extract_shard(transformer,mode,frame):
+    return transformer._extract_from_frame(frame,mode)
+
+def _family_shard(transformer,family,frame):
+    return transformer.feature_family(family,frame)
+
+def _columns_shard(transformer,columns,frame):
+    return FeatureContext(frame,transformer._roles(),transformer.feature_params).compute(columns)
@@ -5,16 +5,20 @@ from fastapi.templating import Jinja2Templates
 import folium
 import os
 import pandas as pd
-from collections import defaultdict
-import csv
 import sys
 import numpy as np
-from functionalities import *
+from concurrent.futures import ThreadPoolExecutor
 import plotly.graph_objects as go
 import plotly.io as pio
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from transformation import DataTransformer
+from functionalities import *
+from DataTransform import DataTransformer
+from utils.cache_utils import file_fingerprint, cache_key
+from utils.trajectory_frame import TrajectoryFrame
+from utils.downsampling import lttb, douglas_peucker
+from utils.spatial_index import GridIndex
+from request_cache import RequestCache
 
 
 app = FastAPI()
@@ -23,64 +27,115 @@ app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# Read ais data
-data = pd.read_csv(r"C:\Users\user\Documents\Feature_Extraction\Feature_Extraction\ais.csv")
-trajectories = list(data.shipid.unique())
+# Path of the ais data, set AIS_DATA_PATH to use another file
+DATA_PATH = os.environ.get("AIS_DATA_PATH", os.path.join(os.path.dirname(__file__), "..", "ais.csv"))
+
+# mfs shown for every trajectory
+STATS_COLUMNS = ['max_speed', 'min_speed', 'avg_speed', 'std_speed',
+                 'max_acceleration', 'min_acceleration', 'avg_acceleration', 'std_acceleration',
+                 'rot_mean', 'rot_std']
+
+# Cached responses and the frame on disk are keyed by DATA_VERSION, a new data file never serves old results
+DATA_VERSION = cache_key(file_fingerprint(DATA_PATH))
+# Memory-mapped copy of the sorted frame, a restart only maps these files
+FRAME_CACHE = os.environ.get("UI_FRAME_CACHE", os.path.join(os.path.dirname(__file__), "cache", "frame"))
+
+data_transform = DataTransformer(
+    dataset_path=DATA_PATH,
+    time_col='t',
+    id_col='shipid',
+    speed_col='speed',
+    heading_col='heading',
+    lat_col='lat',
+    lon_col='lon',
+    course_col='course',
+    shiptype_col='shiptype',
+    destination_col='destination',
+    numeric_cols=['heading', 'course', 'speed'],
+    categorical_cols=['shiptype', 'destination']
+)
+
+frame = TrajectoryFrame.load(FRAME_CACHE, key=DATA_VERSION)
+if frame is None:
+    # One columnar read of the needed columns, imputed and sorted by (shipid, t)
+    data_transform.load_data()
+    data_transform.transfrom_dataset()
+    frame = data_transform.trajectory_frame()
+    frame.save(FRAME_CACHE, key=DATA_VERSION)
+    # features are computed from the frame, the DataFrame is not needed anymore
+    data_transform.data = None
+
+# Per-ship index: trajectory id -> group of the frame, its rows are frame.offsets[g]:frame.offsets[g+1]
+trajectory_index = {str(tid): g for g, tid in enumerate(frame.ids)}
+
+# Grid of the pings for the region queries, cell side in degrees
+spatial_index = GridIndex.from_frame(frame, 'lat', 'lon', cell_size=float(os.environ.get("UI_GRID_CELL", 0.1)))
+
+
+def ship_frame(tid):
+    # Rows of one ship, a slice of the sorted arrays
+    return frame.select(trajectory_index[tid])
+
+# Points drawn per polyline/trace, every zoom level doubles it, 0 draws every ping
+MAX_POINTS = int(os.environ.get("UI_MAX_POINTS", 2000))
+# Zoom levels above this one get its budget
+MAX_ZOOM = int(os.environ.get("UI_MAX_ZOOM", 8))
+
 
-trajectory_data = defaultdict(list)
+def point_budget(max_points, zoom, n_points):
+    # None: full resolution, also once the budget covers every ping of the ship
+    # (so all the higher zooms share one artifact)
+    if max_points <= 0:
+        return None
+    budget = max_points * 2 ** min(max(zoom, 0), MAX_ZOOM)
+    return budget if budget < n_points else None
 
-# Open csv to display trajectories
-with open(r"C:\Users\user\Documents\Feature_Extraction\Feature_Extraction\ais.csv", "r") as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        tid = row["shipid"]
-        lat = float(row["lat"])
-        lon = float(row["lon"])
-        trajectory_data[tid].append((lat, lon))
+
+def ship_points(tid):
+    return int(frame.counts[trajectory_index[tid]])
+
+
+def artifact_name(kind, tid, budget):
+    # map_<tid>.html / plot_<tid>.html at the default resolution (the page links to these)
+    if budget == point_budget(MAX_POINTS, 0, ship_points(tid)):
+        return f"{kind}_{tid}.html"
+    return f"{kind}_{tid}_{budget or 'full'}.html"
+
+# Feature extraction, folium and plotly run in this pool, not on the event loop
+executor = ThreadPoolExecutor(max_workers=int(os.environ.get("UI_WORKERS", min(4, os.cpu_count() or 1))))
+response_cache = RequestCache(executor, max_entries=int(os.environ.get("UI_CACHE_SIZE", 256)))
 
 
 # Display ship selector
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     # Send list of trajectory IDs to template
-    trajectory_ids = list(trajectory_data.keys())
+    trajectory_ids = list(trajectory_index.keys())
     return templates.TemplateResponse("index.html", {"request": request, "trajectory_ids": trajectory_ids})
 
 
 # Main
 @app.get("/trajectory/{tid}")
-async def get_trajectory(tid: str):
+async def get_trajectory(tid: str, max_points: int = MAX_POINTS, zoom: int = 0):
     # Print error message if something goes wrong
-    if tid not in trajectory_data:
+    if tid not in trajectory_index:
         return JSONResponse({"error": "Trajectory not found"}, status_code=404)
 
-    # Get trajectory of a specific ship
-    trajectory = trajectory_data[tid]
+    budget = point_budget(max_points, zoom, ship_points(tid))
+    return await response_cache.get(("trajectory", tid, budget, DATA_VERSION), render_trajectory, tid, budget)
 
-    # Get the full information from ais.csv regarding the ship_id==tid and save it in order to extract mfs
-    df = data.loc[data.shipid == tid]
-    df.to_csv("trajectory.csv", index=False)
 
-    # Extract mfs for a specific ship
-    data_transform = DataTransformer(
-        dataset_path='trajectory.csv',
-        time_col='t',
-        id_col='shipid',
-        speed_col='speed',
-        heading_col='heading',
-        lat_col='lat',
-        long_col='lon',
-        course_col='course',
-        shiptype_col='shiptype',
-        destination_col='destination',
-        numeric_columns=['heading', 'course', 'speed'],
-        categorical_columns=['shiptype', 'destination']
-    )
-
-    data_transform.load_data()
-    data_transform.transform_dataset()
+# mfs and map of one ship, runs in the executor
+def render_trajectory(tid, budget=None):
+    # Get trajectory of a specific ship, straight from the in-memory index
+    ship = ship_frame(tid)
+    trajectory = list(zip(ship['lat'].tolist(), ship['lon'].tolist()))
+    # Simplified polyline for the map, the mfs use every ping
+    keep = douglas_peucker(ship['lat'], ship['lon'], budget) if budget else slice(None)
+    polyline = list(zip(ship['lat'][keep].tolist(), ship['lon'][keep].tolist()))
 
-    features_df = data_transform.get_all_features()
+    # Extract mfs for a specific ship
+    features_df = data_transform.extract_features(columns=STATS_COLUMNS, frame=ship)
 
     # Get mfs to send them to index.html
     stats = {
@@ -94,7 +149,7 @@ async def get_trajectory(tid: str):
         "max_acc": round(features_df.max_acceleration.values[0], 2),
         "min_acc": round(features_df.min_acceleration.values[0], 2),
         "avg_acc": round(features_df.avg_acceleration.values[0], 2),
-        "std_acc": round(features_df.std_speed.values[0], 2),
+        "std_acc": round(features_df.std_acceleration.values[0], 2),
         "mean_rot": round(features_df.rot_mean.values[0], 2),
         "std_rot": round(features_df.rot_std.values[0], 2)
     }
@@ -117,59 +172,102 @@ async def get_trajectory(tid: str):
 
     folium.Marker(trajectory[0], tooltip="Start", icon=folium.Icon(color="green")).add_to(m)
     folium.Marker(trajectory[-1], tooltip="End", icon=folium.Icon(color="red")).add_to(m)
-    folium.PolyLine(trajectory, color="blue", weight=4.5, opacity=0.8).add_to(m)
+    folium.PolyLine(polyline, color="blue", weight=4.5, opacity=0.8).add_to(m)
 
-    # Save the map html with the trajectory id
-    map_path = os.path.join("static", f"map_{tid}.html")
-    m.save(map_path)
+    # Save the map html with the trajectory id and the resolution
+    map_filename = artifact_name("map", tid, budget)
+    m.save(os.path.join("static", map_filename))
 
     # Return the mfs and the map to index.html
     return {
         "stats": stats,
-        "map_url": f"/static/map_{tid}.html"
+        "map_url": f"/static/{map_filename}"
     }
 
 
 @app.get("/trajectory/{tid}/plot", response_class=HTMLResponse)
-async def plot_trajectory_timeseries(request: Request, tid: str = None):
-    plot_html_file = None
-
-    if tid not in trajectory_data:
+async def plot_trajectory_timeseries(request: Request, tid: str = None, max_points: int = MAX_POINTS, zoom: int = 0):
+    if tid not in trajectory_index:
         return HTMLResponse(content="Trajectory not found", status_code=404)
 
-    df = speed(data.loc[data.shipid == tid])
-    timestamps = pd.to_datetime(df["t"])
-    speeds = df["Speed"]
+    budget = point_budget(max_points, zoom, ship_points(tid))
+    plot_html_file = await response_cache.get(("plot", tid, budget, DATA_VERSION), render_plot, tid, budget)
+
+    # Now render the template with the URL of the saved plot image
+    return templates.TemplateResponse("index.html", {
+        "request": request,
+        "trajectory_id": tid,
+        "plot_html_file": plot_html_file
+    })
+
 
-    accelerations = np.gradient(speeds, edge_order=2)
+# Speed/acceleration plot of one ship, runs in the executor
+def render_plot(tid, budget=None):
+    df = speed_series(ship_frame(tid).data)
+    times = df["t"].to_numpy(dtype='datetime64[ns]').view('i8')
 
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=timestamps, y=speeds, mode='lines', name='Speed (km/h)'))
-    fig.add_trace(go.Scatter(x=timestamps, y=accelerations, mode='lines', name='Acceleration (km/h^2)'))
+    for column, name in (("Speed", 'Speed (m/s)'), ("Acceleration", 'Acceleration (m/s^2)')):
+        # Largest-triangle-three-buckets keeps the peaks of every series within the budget
+        keep = lttb(times, df[column], budget) if budget else slice(None)
+        fig.add_trace(go.Scatter(x=df["t"].iloc[keep], y=df[column].iloc[keep], mode='lines', name=name))
     fig.update_layout(xaxis_title="Time", yaxis_title="Value")
 
     fig.update_layout(
         autosize=True,
         height=600,
     )
-    fig.write_html("static/plot.html", include_plotlyjs='cdn', full_html=True)
-
-    plot_filename = f"plot_{tid}.html"
+    plot_filename = artifact_name("plot", tid, budget)
     plot_path = os.path.join("static", plot_filename)
     pio.write_html(fig, file=plot_path, auto_open=False, include_plotlyjs='cdn')
 
-    plot_html_file = f"/static/{plot_filename}"
-
-    # Now render the template with the URL of the saved plot image
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "trajectory_id": tid,
-        "plot_html_file": plot_html_file
-    })
+    return f"/static/{plot_filename}"
+
+
+# Ships that passed through a box (min_lat, min_lon, max_lat, max_lon) or a polygon ("lat,lon;lat,lon;...")
+# in an optional time window, with their mfs if features=true
+@app.get("/region")
+async def get_region(min_lat: float = None, min_lon: float = None, max_lat: float = None, max_lon: float = None,
+                     polygon: str = None, start: str = None, end: str = None, features: bool = False):
+    bbox = (min_lat, min_lon, max_lat, max_lon)
+    try:
+        if polygon is not None:
+            vertices = tuple(tuple(float(v) for v in point.split(',')) for point in polygon.split(';'))
+            query = (spatial_index.query_polygon, vertices)
+        elif None not in bbox:
+            query = (spatial_index.query_bbox, *bbox)
+        else:
+            raise ValueError("Give min_lat, min_lon, max_lat and max_lon or a polygon")
+        window = tuple(None if value is None else pd.Timestamp(value) for value in (start, end))
+    except ValueError as error:
+        return JSONResponse({"error": str(error)}, status_code=400)
+
+    key = ("region", query[0].__name__, query[1:], window, features, DATA_VERSION)
+    try:
+        return await response_cache.get(key, render_region, query, window, features)
+    except ValueError as error:
+        return JSONResponse({"error": str(error)}, status_code=400)
+
+
+# Region query on the grid index, runs in the executor
+def render_region(query, window, features=False):
+    func, *args = query
+    groups = func(*args, start=window[0], end=window[1])
+    result = {"trajectory_ids": [str(tid) for tid in frame.ids[groups]]}
+    if features:
+        stats = []
+        if len(groups):
+            # mfs of the matching ships only
+            features_df = data_transform.extract_features(columns=STATS_COLUMNS, frame=frame.select(groups))
+            features_df = features_df.replace([np.inf, -np.inf], np.nan).round(2)
+            features_df[data_transform.id_col] = features_df[data_transform.id_col].astype(str)
+            stats = features_df.astype(object).where(features_df.notna(), None).to_dict(orient="records")
+        result["features"] = stats
+    return result
 
 
 """
 To run it:
 cd UI
-uvicorn app:app --host 0.0.0.0 --port 8081 --reload
+AIS_DATA_PATH=/path/to/ais.csv uvicorn app:app --host 0.0.0.0 --port 8081 --reload
 """
@@ -1,22 +1,43 @@
+import numpy as np
 import pandas as pd
-from geopy.distance import geodesic
-import matplotlib.pyplot as plt
-
-
-def speed(df):
-    df['t'] = pd.to_datetime(df['t'])
-    speeds = [0]
-    for i in range(1, df.shape[0]):
-        coor_pr = (df.iloc[i-1]["lat"], df.iloc[i-1]["lon"])
-        coor_next = (df.iloc[i]["lat"], df.iloc[i]["lon"])
-        t_pr = df.iloc[i-1]["t"]
-        t_next = df.iloc[i]["t"]
-
-        distance = geodesic(coor_pr, coor_next).meters
-        dt = (t_next - t_pr).total_seconds()
-        if dt == 0:
-            speeds.append(0)
-        else:
-            speeds.append(distance / dt)
-
-    return pd.DataFrame.from_dict({"t": df["t"], "Speed": speeds})
+from utils.geo_utils import distance_km
+
+
+def speed(df, method='vincenty'):
+    """
+    Speed (m/s) derived from consecutive positions of one trajectory, in the order of df.
+    0 for the first ping and where two pings have the same time.
+    method: 'vincenty' (ellipsoid, like geopy's geodesic) | 'haversine'
+    """
+    t = pd.to_datetime(df['t'])
+    return pd.DataFrame.from_dict({"t": t, "Speed": _speed(t, df['lat'], df['lon'], method)})
+
+
+def speed_series(df, method='vincenty'):
+    """
+    speed() plus the acceleration (m/s^2): change of speed over the time since the previous ping,
+    0 for the first ping and where two pings have the same time
+    """
+    t = pd.to_datetime(df['t'])
+    speeds = _speed(t, df['lat'], df['lon'], method)
+    acceleration = np.zeros(len(speeds))
+    acceleration[1:] = _per_second(np.diff(speeds), _seconds(t))
+    return pd.DataFrame.from_dict({"t": t, "Speed": speeds, "Acceleration": acceleration})
+
+
+def _seconds(t):
+    #seconds between consecutive pings
+    return np.diff(t.to_numpy(dtype='datetime64[ns]').view('i8')) / 1e9
+
+def _per_second(delta, seconds):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(seconds == 0, 0.0, delta / seconds)
+
+def _speed(t, lat, lon, method):
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    speeds = np.zeros(len(lat))
+    if len(lat) > 1:
+        meters = distance_km(lat[:-1], lon[:-1], lat[1:], lon[1:], method=method) * 1000
+        speeds[1:] = _per_second(meters, _seconds(t))
+    return speeds
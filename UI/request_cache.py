@@ -0,0 +1,39 @@
+import asyncio
+from collections import OrderedDict
+
+
+class RequestCache:
+    """
+    Runs blocking work in an executor so the event loop stays free, with
+    - an LRU cache of the results (at most max_entries, least recently used evicted first)
+    - coalescing: requests for a key that is already being computed wait for that
+      computation instead of starting a new one
+    Failed computations are not cached.
+    """
+    def __init__(self, executor, max_entries=256):
+        self.executor = executor
+        self.max_entries = max_entries
+        self.results = OrderedDict()
+        self.in_flight = {}
+
+    async def get(self, key, func, *args):
+        if key in self.results:
+            self.results.move_to_end(key)
+            return self.results[key]
+
+        future = self.in_flight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+            self.in_flight[key] = future
+            future.add_done_callback(lambda f: self._done(key, f))
+        # a client that goes away doesn't cancel the work the others wait for
+        return await asyncio.shield(future)
+
+    def _done(self, key, future):
+        self.in_flight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.results[key] = future.result()
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_entries:
+            self.results.popitem(last=False)
@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import subprocess
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_ais
+from DataTransform import DataTransformer
+from features.speed import average_speed_per_id
+from features.acceleration import acceleration_per_id
+from features.rot import rot_per_id
+from features.kinematics import kinematics_per_id
+from features.trajectory import trajectory
+from features.distance_and_straightness import _compute_total_and_straightness_metrics
+from features.max_spatial_spread import compute_max_spatial_spread
+from features.curvature import curvature_results
+from features.stops import count_stops
+
+"""
+Times (wall and CPU) and memory-profiles (tracemalloc peak) every feature function and
+get_all_features end to end on synthetic AIS data of growing size, and writes the
+results as JSON so two versions can be compared:
+
+    python -m benchmarks.run --tiers 1k 100k --output bench.json
+    python -m benchmarks.run --compare old.json new.json
+"""
+
+#name -> (ships, pings per ship)
+TIERS = {
+    '1k': (10, 100),
+    '10k': (50, 200),
+    '100k': (200, 500),
+    '1m': (1_000, 1_000),
+    '10m': (5_000, 2_000),
+}
+#the legacy transformation.DataTransformer evaluates 100k spline points per ship
+LEGACY_MAX_ROWS = 100_000
+
+
+def _transformer(data, cls=DataTransformer):
+    transformer = cls('synthetic.csv')
+    transformer.data = data.copy()
+    return transformer
+
+def _legacy_all_features(data):
+    import transformation
+    return _transformer(data, transformation.DataTransformer).get_all_features()
+
+#name -> function of the dataset
+BENCHMARKS = {
+    'average_speed_per_id': lambda d: average_speed_per_id(d, 'shipid', 't', 'speed'),
+    'acceleration_per_id': lambda d: acceleration_per_id(d, 't', 'shipid', 'speed'),
+    'rot_per_id': lambda d: rot_per_id(d, 'heading', 'shipid', 't'),
+    'kinematics_per_id': lambda d: kinematics_per_id(d, 'shipid', 't', 'speed', 'heading'),
+    'trajectory': lambda d: trajectory(d, 'shipid', 't', 'lat', 'lon'),
+    'total_and_straightness': lambda d: _compute_total_and_straightness_metrics(d, 'shipid', 't', 'lat', 'lon'),
+    'max_spatial_spread': lambda d: compute_max_spatial_spread(d, 'shipid', 't', 'lat', 'lon'),
+    'curvature_results': lambda d: curvature_results(d, 'shipid', 't', 'lat', 'lon'),
+    'count_stops': lambda d: count_stops(d, 'shipid', 't', 'lat', 'lon', 'speed'),
+    'get_all_features': lambda d: _transformer(d).get_all_features(),
+    'legacy_get_all_features': _legacy_all_features,
+}
+
+
+def measure(func, data, repeat=3, memory=True):
+    """
+    Best wall/CPU time of repeat runs and the peak memory (MB) traced during one extra run
+    """
+    wall, cpu = [], []
+    for _ in range(repeat):
+        w, c = time.perf_counter(), time.process_time()
+        func(data)
+        wall.append(time.perf_counter() - w)
+        cpu.append(time.process_time() - c)
+    result = {'wall_s': min(wall), 'cpu_s': min(cpu), 'wall_s_all': wall}
+    if memory:
+        #a separate run, tracemalloc slows python code down a lot
+        tracemalloc.start()
+        try:
+            func(data)
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024**2
+        finally:
+            tracemalloc.stop()
+    return result
+
+def run(tiers, benchmarks=None, repeat=3, memory=True, seed=0):
+    results = []
+    for tier in tiers:
+        n_ships, pings = TIERS[tier]
+        data = generate_ais(n_ships, pings, seed=seed)
+        for name in benchmarks or BENCHMARKS:
+            if name.startswith('legacy') and len(data) > LEGACY_MAX_ROWS:
+                continue
+            print(f"{tier:>5} {name:<26}", end=' ', flush=True)
+            result = measure(BENCHMARKS[name], data, repeat=repeat, memory=memory)
+            print(f"{result['wall_s']:9.4f}s  {result.get('peak_mb', float('nan')):9.1f}MB")
+            results.append({'tier': tier, 'rows': len(data), 'ships': n_ships, 'benchmark': name, **result})
+    return {'meta': _meta(seed, repeat), 'results': results}
+
+def _meta(seed, repeat):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': seed,
+        'repeat': repeat,
+    }
+
+def compare(old, new, threshold=0.10):
+    """
+    Rows of (tier, benchmark, old/new wall time and ratio) for the benchmarks in both results,
+    flagged as regression when new is more than threshold slower
+    """
+    before = {(r['tier'], r['benchmark']): r for r in old['results']}
+    rows = []
+    for r in new['results']:
+        key = (r['tier'], r['benchmark'])
+        if key not in before:
+            continue
+        ratio = r['wall_s'] / before[key]['wall_s'] if before[key]['wall_s'] else np.nan
+        rows.append({'tier': key[0], 'benchmark': key[1], 'old_wall_s': before[key]['wall_s'],
+                     'new_wall_s': r['wall_s'], 'ratio': ratio, 'regression': ratio > 1 + threshold})
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Feature extraction benchmarks on synthetic AIS data')
+    parser.add_argument('--tiers', nargs='+', default=['1k', '10k', '100k'], choices=list(TIERS))
+    parser.add_argument('--benchmarks', nargs='+', default=None, choices=list(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmarks/results.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files and exit')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            table = compare(json.load(f_old), json.load(f_new), threshold=args.threshold)
+        print(table.to_string(index=False))
+        return 1 if not table.empty and table['regression'].any() else 0
+
+    results = run(args.tiers, args.benchmarks, repeat=args.repeat, memory=not args.no_memory, seed=args.seed)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
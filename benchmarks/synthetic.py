@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+"""
+Deterministic synthetic AIS data for benchmarks and quick checks.
+Every ship sails from a random start with its own cruise speed, the heading
+does a random walk (turn_rate), pings come every interval seconds +- jitter and
+the ship now and then stops (speed ~0) for a while. Vectorized, so 10M rows
+take a few seconds.
+"""
+
+SHIPTYPES = ['cargo', 'tanker', 'passenger', 'fishing', 'tug']
+DESTINATIONS = ['PIRAEUS', 'RAFINA', 'LAVRIO', 'SALAMINA', 'AEGINA', 'ELEFSINA']
+KNOT = 0.514444  #m/s
+METERS_PER_DEGREE = 111_320.0
+
+
+def generate_ais(n_ships,pings_per_ship,interval=60.0,jitter=0.3,stop_frequency=2.0,stop_length=20,
+                 turn_rate=5.0,seed=0,start='2024-01-01',sort_by_time=True):
+    """
+    n_ships, pings_per_ship: size of the dataset (n_ships * pings_per_ship rows)
+    interval: mean seconds between two pings of a ship
+    jitter: the gap is interval * (1 +- jitter), uniform
+    stop_frequency: mean number of stops per ship, stop_length: mean pings of a stop
+    turn_rate: std (degrees) of the heading change between two pings
+    sort_by_time: rows ordered by time like an AIS export, otherwise grouped by ship
+    Same arguments -> same dataset.
+    """
+    rng = np.random.default_rng(seed)
+    n = n_ships * pings_per_ship
+    ship = np.repeat(np.arange(n_ships), pings_per_ship)
+    first = np.arange(n_ships) * pings_per_ship
+
+    gaps = interval * (1 + jitter * rng.uniform(-1, 1, n))
+    gaps[first] = rng.uniform(0, 3600, n_ships)
+    seconds = _cumsum_per_ship(gaps, first, pings_per_ship)
+
+    stopped = _stopped(n, stop_frequency / max(pings_per_ship, 1), 1 / max(stop_length, 1), rng)
+    cruise = rng.uniform(8, 16, n_ships)[ship]
+    speed = np.where(stopped, rng.uniform(0, 0.3, n), cruise + rng.normal(0, 0.5, n)).clip(min=0)
+
+    turns = rng.normal(0, turn_rate, n)
+    turns[first] = rng.uniform(0, 360, n_ships)
+    heading = _cumsum_per_ship(turns, first, pings_per_ship) % 360
+
+    #dead reckoning from the start position
+    step = speed * KNOT * np.r_[0, np.diff(seconds)]
+    step[first] = 0
+    start_lat = rng.uniform(35, 40, n_ships)
+    lat = start_lat[ship] + _cumsum_per_ship(step * np.cos(np.radians(heading)), first, pings_per_ship) / METERS_PER_DEGREE
+    lon_step = step * np.sin(np.radians(heading)) / (METERS_PER_DEGREE * np.cos(np.radians(lat)))
+    lon = rng.uniform(20, 27, n_ships)[ship] + _cumsum_per_ship(lon_step, first, pings_per_ship)
+
+    data = pd.DataFrame({
+        't': pd.Timestamp(start) + pd.to_timedelta(np.round(seconds), unit='s'),
+        'shipid': ship,
+        'speed': speed.round(1),
+        'heading': heading.round(1),
+        'lat': lat,
+        'lon': lon,
+        'course': ((heading + rng.normal(0, 2, n)) % 360).round(1),
+        'shiptype': np.asarray(SHIPTYPES)[rng.integers(0, len(SHIPTYPES), n_ships)][ship],
+        'destination': np.asarray(DESTINATIONS)[rng.integers(0, len(DESTINATIONS), n_ships)][ship]
+    })
+    if sort_by_time:
+        data = data.sort_values('t', kind='stable', ignore_index=True)
+    return data
+
+#cumulative sum restarted at every ship (ships are contiguous blocks of pings_per_ship rows)
+def _cumsum_per_ship(values, first, pings_per_ship):
+    total = np.cumsum(values)
+    return total - np.repeat(total[first] - values[first], pings_per_ship)
+
+#two state (moving/stopped) Markov chain over the rows, as alternating geometric runs
+def _stopped(n, p_stop, p_go, rng):
+    if n == 0 or p_stop <= 0:
+        return np.zeros(n, dtype=bool)
+    runs = []
+    covered, moving = 0, True
+    while covered < n:
+        #enough runs for the rest of the rows on average, drawn in one go
+        k = max(16, int(2 * (n - covered) * min(p_stop, 1) + 16))
+        lengths = np.empty(k, dtype=np.int64)
+        lengths[0::2] = rng.geometric(min(p_stop, 1), (k + 1) // 2) if moving else rng.geometric(min(p_go, 1), (k + 1) // 2)
+        lengths[1::2] = rng.geometric(min(p_go, 1), k // 2) if moving else rng.geometric(min(p_stop, 1), k // 2)
+        runs.append((lengths, moving))
+        covered += lengths.sum()
+        moving = moving if k % 2 == 0 else not moving
+    state = []
+    for lengths, moving in runs:
+        flags = np.zeros(len(lengths), dtype=bool)
+        flags[(0 if not moving else 1)::2] = True
+        state.append(np.repeat(flags, lengths))
+    return np.concatenate(state)[:n]
@@ -1,15 +1,95 @@
+import numpy as np
 import pandas as pd 
+from joblib import Parallel, delayed
+from kneed import KneeLocator
 from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
 from sklearn.preprocessing import StandardScaler
 from sklearn.decomposition import PCA
-import matplotlib.pyplot as plt 
 import os
 from time import sleep
 
+K_RANGE = range(1, 10)
+SPACES = ('scaled', 'pca')
+K_METHODS = ('knee', 'silhouette')
+
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
+def auto_kmeans(df, features_col, target_col=None, k_range=K_RANGE, space='auto', method='knee',
+                sample_size=10_000, n_jobs=-1, random_state=42):
+    """
+    Headless version of automate_kmeans_crosstab: KMeans is fitted for every K of k_range on the
+    standardized features and on their 2D PCA, in parallel (joblib, n_jobs processes), and K is chosen
+    without asking.
+    space: 'scaled' | 'pca' | 'auto' (the space with the best silhouette at its chosen K)
+    method: 'knee' (elbow of the SSE curve with kneed, the best silhouette if there is no knee)
+            | 'silhouette' (the best silhouette)
+    sample_size: silhouettes are computed on this many rows (the same random rows for every fit)
+    Returns a dict with
+        labels: Series of cluster labels indexed like df
+        crosstab: clusters vs target_col (None without target_col)
+        sweep: DataFrame space, k, sse, silhouette of every fit
+        space, k: the chosen ones
+    """
+    if space not in SPACES + ('auto',):
+        raise ValueError(f"Invalid space. Choose from: {SPACES + ('auto',)}")
+    if method not in K_METHODS:
+        raise ValueError(f"Invalid method. Choose from: {K_METHODS}")
+    X = _feature_matrix(df, features_col)
+    spaces = {'scaled': StandardScaler().fit_transform(X)}
+    spaces['pca'] = PCA(n_components=min(2, X.shape[1]), random_state=random_state).fit_transform(spaces['scaled'])
+    if space != 'auto':
+        spaces = {space: spaces[space]}
+
+    ks = [k for k in k_range if 1 <= k <= len(X)]
+    if not ks:
+        raise ValueError(f"No K of k_range fits {len(X)} rows")
+    grid = [(name, k) for name in spaces for k in ks]
+    fits = Parallel(n_jobs=n_jobs)(delayed(_sweep_fit)(spaces[name], k, sample_size, random_state) for name, k in grid)
+    sweep = pd.DataFrame([point + fit for point, fit in zip(grid, fits)], columns=['space', 'k', 'sse', 'silhouette'])
+
+    chosen = {name: _choose_k(sweep[sweep['space'] == name], method) for name in spaces}
+    if space == 'auto':
+        best = sweep.set_index(['space', 'k'])['silhouette']
+        space = max(chosen, key=lambda name: np.nan_to_num(best[(name, chosen[name])], nan=-1.0))
+    k = chosen[space]
+
+    labels = KMeans(n_clusters=k, random_state=random_state).fit_predict(spaces[space])
+    labels = pd.Series(labels, index=df.index, name='clusters')
+    crosstab = pd.crosstab(labels, df[target_col]) if target_col is not None else None
+    return {'labels': labels, 'crosstab': crosstab, 'sweep': sweep, 'space': space, 'k': k}
+
+def _feature_matrix(df, features_col):
+    missing = [col for col in features_col if col not in df.columns]
+    if missing:
+        raise ValueError(f'{missing} not in the dataset')
+    X = df[list(features_col)].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    if np.isnan(X).any():
+        raise ValueError('Feature columns have missing or non numeric values, impute them first')
+    return X
+
+#sse and silhouette (on sample_size rows, NaN for K=1 or K=n) of one KMeans fit
+def _sweep_fit(X, k, sample_size, random_state):
+    kmeans = KMeans(n_clusters=k, random_state=random_state).fit(X)
+    silhouette = np.nan
+    if 2 <= k < len(X):
+        silhouette = silhouette_score(X, kmeans.labels_, sample_size=min(sample_size, len(X)), random_state=random_state)
+    return float(kmeans.inertia_), float(silhouette)
+
+def _choose_k(sweep, method):
+    ks, sse, silhouette = sweep['k'].to_numpy(), sweep['sse'].to_numpy(), sweep['silhouette'].to_numpy()
+    if method == 'knee' and len(ks) >= 3:
+        knee = KneeLocator(ks, sse, curve='convex', direction='decreasing').knee
+        if knee is not None:
+            return int(knee)
+    if np.isnan(silhouette).all():
+        return int(ks[0])
+    return int(ks[np.nanargmax(silhouette)])
+
 def automate_kmeans_crosstab(df, features_col, target_col):
+    #interactive: plots the elbow curves and asks for the space and K, auto_kmeans is the headless one
+    import matplotlib.pyplot as plt
     df_copy = df.copy()
 
     # Keep original target for later use
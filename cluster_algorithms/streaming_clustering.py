@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+from utils.data_loader import load_csv_chunks
+from cluster_algorithms.auto_kmeans_clustering import _feature_matrix
+
+"""
+Out-of-core KMeans for feature tables too big for automate_kmeans_crosstab/auto_kmeans:
+the table is read in batches several times (scaling, PCA, n_epochs of KMeans, labels)
+and only one batch plus the fitted models are in memory at a time.
+"""
+
+
+def streaming_kmeans(source, features_col, n_clusters, target_col=None, n_components=2, batch_size=100_000,
+                     n_epochs=3, random_state=42):
+    """
+    source: a feature table as a DataFrame, the path of a csv or a callable that returns a new
+            iterable of DataFrame batches on every call (e.g. lambda: pd.read_parquet(...) per file)
+    n_components: IncrementalPCA components, None to cluster the standardized features
+    n_epochs: passes of MiniBatchKMeans.partial_fit over the batches
+    Batches are always read in the same order and MiniBatchKMeans is seeded with random_state,
+    so the same source gives the same labels.
+    Returns a dict with
+        labels: Series of cluster labels, indexed like the batches (int32)
+        crosstab: clusters vs target_col, counted batch by batch (None without target_col)
+        scaler, pca, kmeans: the fitted models (pca is None without n_components)
+    """
+    if n_clusters < 1:
+        raise ValueError('n_clusters must be at least 1')
+    if n_epochs < 1:
+        raise ValueError('n_epochs must be at least 1')
+    batches = _batch_source(source, batch_size)
+    min_rows = max(n_clusters, n_components or 1)
+
+    scaler = StandardScaler()
+    for X, _, _ in _batches(batches, features_col, target_col, min_rows):
+        scaler.partial_fit(X)
+    if not hasattr(scaler, 'n_samples_seen_'):
+        raise ValueError('No rows in the source')
+
+    pca = None
+    if n_components is not None:
+        pca = IncrementalPCA(n_components=n_components)
+        for X, _, _ in _batches(batches, features_col, target_col, min_rows):
+            #a last batch smaller than n_components can't be fitted on its own
+            if len(X) >= n_components:
+                pca.partial_fit(scaler.transform(X))
+    project = (lambda X: pca.transform(scaler.transform(X))) if pca is not None else scaler.transform
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, batch_size=batch_size, n_init=3)
+    for _ in range(n_epochs):
+        for X, _, _ in _batches(batches, features_col, target_col, min_rows):
+            if not hasattr(kmeans, 'cluster_centers_') and len(X) < n_clusters:
+                raise ValueError(f'{len(X)} rows, less than n_clusters={n_clusters}')
+            kmeans.partial_fit(project(X))
+
+    labels, counts = [], []
+    for X, index, target in _batches(batches, features_col, target_col, min_rows):
+        batch_labels = pd.Series(kmeans.predict(project(X)).astype(np.int32), index=index, name='clusters')
+        labels.append(batch_labels)
+        if target is not None:
+            counts.append(pd.crosstab(batch_labels.to_numpy(), target.to_numpy()))
+    crosstab = None
+    if target_col is not None:
+        crosstab = pd.concat(counts).groupby(level=0).sum().fillna(0).astype(np.int64)
+        crosstab.index.name, crosstab.columns.name = 'clusters', target_col
+    return {'labels': pd.concat(labels), 'crosstab': crosstab, 'scaler': scaler, 'pca': pca, 'kmeans': kmeans}
+
+#zero argument callable giving a new iterable of DataFrames on every pass
+def _batch_source(source, batch_size):
+    if isinstance(source, pd.DataFrame):
+        return lambda: (source.iloc[i:i + batch_size] for i in range(0, len(source), batch_size))
+    if isinstance(source, str):
+        return lambda: load_csv_chunks(source, batch_size)
+    if callable(source):
+        return source
+    raise ValueError('source must be a DataFrame, a csv path or a callable returning DataFrame batches')
+
+#(features, index, target) per batch, consecutive batches merged until they have min_rows (the last may have less)
+def _batches(batches, features_col, target_col, min_rows):
+    pending = []
+    for batch in batches():
+        pending.append(batch)
+        if sum(len(part) for part in pending) >= min_rows:
+            yield _unpack(pending, features_col, target_col)
+            pending = []
+    if pending and sum(len(part) for part in pending):
+        yield _unpack(pending, features_col, target_col)
+
+def _unpack(parts, features_col, target_col):
+    batch = parts[0] if len(parts) == 1 else pd.concat(parts)
+    target = batch[target_col] if target_col is not None else None
+    return _feature_matrix(batch, features_col), batch.index, target
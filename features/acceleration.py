@@ -1,5 +1,7 @@
+import numpy as np
 import pandas as pd 
-from utils.time_utils import categorize_time
+from utils.trajectory_frame import TrajectoryFrame
+from features.kinematics import _acceleration_stats, _time_diff_seconds
 
 
 def acceleration_per_id(df,time_col,id_col,speed_col):
@@ -9,17 +11,8 @@ def acceleration_per_id(df,time_col,id_col,speed_col):
         raise ValueError(f"{id_col} not in dataset")
     if speed_col not in df.columns:
         raise ValueError(f"{speed_col} not in dataset")
-    df = categorize_time(df,time_col)
-    new_df = df.copy()
-    new_df = new_df.sort_values(by=[id_col,time_col])
+    frame = TrajectoryFrame.from_dataframe(df,id_col,time_col,columns=[speed_col])
 
-    new_df['time_diff'] = new_df.groupby(id_col)[time_col].diff().dt.total_seconds().fillna(1)
-    new_df['speed_diff'] = new_df.groupby(id_col)[speed_col].diff().fillna(0)
-    new_df['acceleration'] = new_df['speed_diff']/new_df['time_diff']
-
-    return new_df.groupby(id_col)['acceleration'].agg(
-        avg_acceleration = 'mean',
-        max_acceleration='max',
-        min_acceleration='min',
-        std_acceleration='std'
-    ).reset_index()
\ No newline at end of file
+    features = {id_col: frame.ids}
+    features.update(_acceleration_stats(frame, np.asarray(frame[speed_col], dtype=float), _time_diff_seconds(frame)))
+    return pd.DataFrame(features)
@@ -1,54 +1,171 @@
 import pandas as pd
 import numpy as np
 from scipy.interpolate import CubicSpline
+from utils.trajectory_frame import TrajectoryFrame
 
+CURVATURE_COLUMNS = ["max_curvature","min_curvature","mean_curvature","std_curvature","median_curvature"]
+CURVATURE_MODES = ('fixed','adaptive','analytic')
 
 
-def curvature_results(df,id_col,time_col,lat_col,lon_col):
+def curvature_results(df,id_col,time_col,lat_col,lon_col,mode='fixed',tol=1e-3,n=100_000):
+      """
+      mode: 'fixed' | 'adaptive' | 'analytic'
+        fixed: evaluates the splines on n points for every id (default)
+        adaptive (opt-in): samples per knot interval, doubling the density until the statistics
+                  change less than tol (relative), never using more than n points; the values
+                  differ from fixed near stops, where the curvature spikes
+        analytic: statistics straight from the piecewise cubic coefficients
+      """
       required_columns = [id_col,lat_col,lon_col]
       if not all(cols in df.columns for cols in required_columns):
              raise ValueError("Missing Columns")
-    
-      result = df.groupby(id_col).apply(
-          lambda group: curvature_calculation(group,time_col,lat_col,lon_col)
-      ).reset_index()
-      return result[[id_col,"max_curvature","min_curvature","mean_curvature","std_curvature","median_curvature"]]
-
-def curvature_calculation(group,time_col,lat_col,lon_col,n=100_000):
-
-          if group.shape[0] < 3:
-               return pd.Series({"max_curvature": 0.0,
-                    "min_curvature": 0.0,
-                    "mean_curvature": 0.0,
-                    "std_curvature": 0.0,
-                    "median_curvature": 0.0
-                })
-          t = group.sort_values(by=time_col)
-          t = np.linspace(0,1,group.shape[0])
-
-          t_fine = np.linspace(0,1,n)
-
-          lat_spline = CubicSpline(t, group[lat_col].values)
-          lon_spline = CubicSpline(t, group[lon_col].values)
-
-          # Fine time interval
-          t_fine = np.linspace(0, 1, n)
-
-          # Approximate derivatives over the fined time
-          dlat = lat_spline(t_fine, 1)
-          dlon = lon_spline(t_fine, 1)
-          ddlat = lat_spline(t_fine, 2)
-          ddlon = lon_spline(t_fine, 2)
-
-          # Compute curvature over the fined time
-          curv = (dlat * ddlon - dlon * ddlat) / (dlat**2 + dlon**2)**1.5
-
-          return pd.Series({"max_curvature": curv.max(),
-                    "min_curvature": curv.min(),
-                    "mean_curvature": curv.mean(),
-                    "std_curvature": curv.std(),
-                    "median_curvature": np.median(curv)
-                    })
+      if mode not in CURVATURE_MODES:
+             raise ValueError(f"Invalid mode. Choose from: {CURVATURE_MODES}")
+
+      frame = TrajectoryFrame.from_dataframe(df,id_col,time_col,columns=[lat_col,lon_col])
+      lat = np.asarray(frame[lat_col], dtype=float)
+      lon = np.asarray(frame[lon_col], dtype=float)
+
+      rows = [_curvature_stats(lat[s:e],lon[s:e],mode=mode,tol=tol,n=n) for s, e in zip(frame.starts, frame.ends)]
+      result = pd.DataFrame(rows, columns=CURVATURE_COLUMNS)
+      result.insert(0, id_col, frame.ids)
+      return result
+
+def curvature_calculation(group,time_col,lat_col,lon_col,n=100_000,mode='fixed',tol=1e-3):
+          if time_col in group.columns:
+               group = group.sort_values(by=time_col)
+          return pd.Series(_curvature_stats(group[lat_col].to_numpy(dtype=float),
+                                            group[lon_col].to_numpy(dtype=float),
+                                            mode=mode,tol=tol,n=n))
+
+def _curvature_stats(lat,lon,mode='fixed',tol=1e-3,n=100_000):
+          if len(lat) < 3:
+               return dict.fromkeys(CURVATURE_COLUMNS, 0.0)
+
+          t = np.linspace(0,1,len(lat))
+          lat_spline = CubicSpline(t, lat)
+          lon_spline = CubicSpline(t, lon)
+
+          if mode == 'fixed':
+               # Fine time interval
+               t_fine = np.linspace(0, 1, n)
+               # Approximate derivatives over the fined time
+               dlat = lat_spline(t_fine, 1)
+               dlon = lon_spline(t_fine, 1)
+               ddlat = lat_spline(t_fine, 2)
+               ddlon = lon_spline(t_fine, 2)
+               curv = (dlat * ddlon - dlon * ddlat) / (dlat**2 + dlon**2)**1.5
+               return _stats(curv)
+
+          # Every knot interval has the same length since t is uniform
+          h = t[1] - t[0]
+          if mode == 'adaptive':
+               return _adaptive_stats(lat_spline.c, lon_spline.c, h, tol, n)
+          return _analytic_stats(lat_spline.c, lon_spline.c, h)
+
+def _stats(curv, weights=None):
+     if weights is None:
+          return {"max_curvature": curv.max(),
+                  "min_curvature": curv.min(),
+                  "mean_curvature": curv.mean(),
+                  "std_curvature": curv.std(),
+                  "median_curvature": np.median(curv)}
+
+     total = weights.sum()
+     mean = (weights * curv).sum() / total
+     order = np.argsort(curv)
+     cum = np.cumsum(weights[order])
+     median = curv[order][min(np.searchsorted(cum, 0.5 * total), len(curv) - 1)]
+     return {"max_curvature": curv.max(),
+             "min_curvature": curv.min(),
+             "mean_curvature": mean,
+             "std_curvature": np.sqrt((weights * (curv - mean)**2).sum() / total),
+             "median_curvature": median}
+
+"""
+CubicSpline keeps one cubic per knot interval:
+    p(s) = c[0]*s^3 + c[1]*s^2 + c[2]*s + c[3] , s = t - t_k
+so the derivatives on every interval are evaluated straight from the coefficients.
+"""
+
+def _derivatives(c, s):
+     a, b, g = c[0][:, None], c[1][:, None], c[2][:, None]
+     return 3*a*s**2 + 2*b*s + g, 6*a*s + 2*b, np.broadcast_to(6*a, s.shape)
+
+def _curvature_from_coefficients(c_lat, c_lon, s):
+     dlat, ddlat, _ = _derivatives(c_lat, s)
+     dlon, ddlon, _ = _derivatives(c_lon, s)
+     return (dlat * ddlon - dlon * ddlat) / (dlat**2 + dlon**2)**1.5
+
+def _adaptive_stats(c_lat, c_lon, h, tol, max_samples):
+     m = c_lat.shape[1]
+     per_interval = max(1, min(4, (max_samples - 1) // m))
+     previous = None
+     while True:
+          s = np.broadcast_to(h * np.arange(per_interval) / per_interval, (m, per_interval))
+          # Last knot closes the curve
+          end = _curvature_from_coefficients(c_lat[:, -1:], c_lon[:, -1:], np.array([[h]]))
+          curv = np.concatenate((_curvature_from_coefficients(c_lat, c_lon, s).ravel(), end.ravel()))
+          current = _stats(curv)
+
+          if previous is not None and _converged(previous, current, tol):
+               return current
+          if 2 * per_interval * m + 1 > max_samples:
+               return current
+          previous = current
+          per_interval *= 2
+
+def _converged(previous, current, tol):
+     scale = max(abs(current["std_curvature"]), abs(current["mean_curvature"]), np.finfo(float).tiny)
+     extent = max(abs(current["max_curvature"]), abs(current["min_curvature"]), np.finfo(float).tiny)
+     for key in CURVATURE_COLUMNS:
+          reference = extent if key in ("max_curvature", "min_curvature") else scale
+          if not abs(current[key] - previous[key]) <= tol * reference:
+               return False
+     return True
+
+def _analytic_stats(c_lat, c_lon, h, order=16, grid=32, iterations=60):
+     """
+     mean/std/median are integrals over t, computed with Gauss-Legendre quadrature on every
+     knot interval. max/min come from the roots of d(curvature)/ds on every interval
+     (bracketed on a grid and refined with bisection) together with the interval ends.
+     """
+     m = c_lat.shape[1]
+     nodes, weights = np.polynomial.legendre.leggauss(order)
+     s = np.broadcast_to((nodes + 1) / 2 * h, (m, order))
+     w = np.broadcast_to(weights / 2 * h, (m, order)).ravel()
+     stats = _stats(_curvature_from_coefficients(c_lat, c_lon, s).ravel(), w)
+
+     s_grid = np.broadcast_to(np.linspace(0, h, grid + 1), (m, grid + 1))
+     curv_grid = _curvature_from_coefficients(c_lat, c_lon, s_grid)
+     p = _curvature_slope(c_lat, c_lon, s_grid)
+     rows, cols = np.nonzero(np.sign(p[:, :-1]) * np.sign(p[:, 1:]) < 0)
+     lo, hi = s_grid[rows, cols], s_grid[rows, cols + 1]
+     p_lo = p[rows, cols]
+     c_lat_roots, c_lon_roots = c_lat[:, rows], c_lon[:, rows]
+     for _ in range(iterations):
+          mid = (lo + hi) / 2
+          p_mid = _curvature_slope(c_lat_roots, c_lon_roots, mid[:, None])[:, 0]
+          left = np.sign(p_mid) == np.sign(p_lo)
+          lo = np.where(left, mid, lo)
+          p_lo = np.where(left, p_mid, p_lo)
+          hi = np.where(left, hi, mid)
+     curv_roots = _curvature_from_coefficients(c_lat_roots, c_lon_roots, ((lo + hi) / 2)[:, None]).ravel()
+
+     candidates = np.concatenate((curv_grid.ravel(), curv_roots))
+     stats["max_curvature"] = candidates.max()
+     stats["min_curvature"] = candidates.min()
+     return stats
+
+# Numerator of d(curvature)/ds, with N = x'y''-y'x'' and D = x'^2+y'^2: N'D - 1.5 N D'
+def _curvature_slope(c_lat, c_lon, s):
+     dlat, ddlat, dddlat = _derivatives(c_lat, s)
+     dlon, ddlon, dddlon = _derivatives(c_lon, s)
+     N = dlat * ddlon - dlon * ddlat
+     dN = dlat * dddlon - dlon * dddlat
+     D = dlat**2 + dlon**2
+     dD = 2 * (dlat * ddlat + dlon * ddlon)
+     return dN * D - 1.5 * N * dD
 
 
 def curvature(df, n=100000):
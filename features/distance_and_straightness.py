@@ -1,34 +1,52 @@
-from geopy.distance import geodesic
+import numpy as np
 import pandas as pd
+from utils.geo_utils import distance_km, segment_distances_km
+from utils.trajectory_frame import TrajectoryFrame
 
-def _compute_total_and_straightness_metrics(df,id_col,time_col,lat_col,lon_col):
+DISTANCE_COLUMNS = ['total_distance_km', 'straightness_ratio', 'tortuosity']
+
+def _compute_total_and_straightness_metrics(df,id_col,time_col,lat_col,lon_col,method='haversine'):
+        """
+        method: 'haversine' | 'vincenty'
+        Segment distances are computed for the whole sorted frame in one shot
+        and summed per id.
+        """
         required_cols = [id_col, time_col, lat_col, lon_col]
         if not all(col in df.columns for col in required_cols):
             raise ValueError("Missing one or more required columns in the dataset.")
 
-        new_df = df.sort_values(by=[id_col, time_col])
+        frame = TrajectoryFrame.from_dataframe(df,id_col,time_col,columns=[lat_col,lon_col])
+        return _compute_metrics(frame.ids,frame.starts,np.asarray(frame[lat_col], dtype=float),np.asarray(frame[lon_col], dtype=float),
+                                id_col=id_col,method=method)
+
+def _compute_metrics(group_ids,starts,lat,lon,id_col,method='haversine'):
+        """
+        group_ids: the id of every group, starts: row offset where every group begins
+        lat/lon: coordinates of the whole frame sorted by id and time
+        """
+        if len(starts) == 0:
+            return pd.DataFrame(columns=[id_col, *DISTANCE_COLUMNS])
+
+        seg = segment_distances_km(lat, lon, starts=starts, method=method)
+        return _metrics_from_segments(group_ids,starts,lat,lon,seg,id_col,method=method)
 
-        result = new_df.groupby(id_col).apply(
-            lambda group: _compute_metrics(group,lat_col=lat_col,lon_col=lon_col)
-        ).reset_index()
+#same as _compute_metrics with the segment distances (0 at group starts) already computed
+def _metrics_from_segments(group_ids,starts,lat,lon,seg,id_col,method='haversine'):
+        total_distance = np.add.reduceat(seg, starts)
 
-        return result[[id_col, 'total_distance_km', 'straightness_ratio', 'tortuosity']]
+        ends = np.r_[starts[1:], len(lat)] - 1
+        direct_distance = distance_km(lat[starts], lon[starts], lat[ends], lon[ends], method=method)
 
-def _compute_metrics(group,lat_col,lon_col):
-        coords = list(zip(group[lat_col], group[lon_col]))
-        total_distance = sum(
-            geodesic(coords[i], coords[i + 1]).kilometers
-            for i in range(len(coords) - 1)
-        ) if len(coords) >= 2 else 0.0
+        return _metrics_from_distances(group_ids,total_distance,direct_distance,id_col)
 
-        if len(coords) < 2:
-            straightness, tortuosity = 0.0, 0.0
-        else:
-            direct_distance = geodesic(coords[0], coords[-1]).kilometers
-            straightness = 0 if total_distance == 0 else direct_distance / total_distance
-            tortuosity = 0 if direct_distance == 0 else total_distance / direct_distance
+#straightness and tortuosity from the travelled and the direct (first to last ping) distance
+def _metrics_from_distances(group_ids,total_distance,direct_distance,id_col):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            straightness = np.where(total_distance == 0, 0.0, direct_distance / total_distance)
+            tortuosity = np.where(direct_distance == 0, 0.0, total_distance / direct_distance)
 
-        return pd.Series({
+        return pd.DataFrame({
+            id_col: group_ids,
             'total_distance_km': total_distance,
             'straightness_ratio': straightness,
             'tortuosity': tortuosity
@@ -0,0 +1,382 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from utils.trajectory_frame import TrajectoryFrame
+from utils.geo_utils import distance_km, segment_distances_km
+from utils.segment_ops import segment_stats, segment_max, segment_min, merge_moments, moments_std
+from features.kinematics import SPEED_COLUMNS, ACCELERATION_COLUMNS, ROT_COLUMNS
+from features.trajectory import trajectory
+from features.distance_and_straightness import _metrics_from_distances
+from features.max_spatial_spread import hull_points, _max_spread_per_group
+from features.curvature import CURVATURE_COLUMNS
+
+"""
+Compact per-ship accumulator state that is updated chunk by chunk and gives the same
+feature table as DataTransformer.get_all_features, so files larger than memory can be
+processed with memory bounded by the chunk size plus the number of ships.
+
+Every ship keeps counts/means/m2 (Chan/Welford) for acceleration and ROT, the running
+aggregates of the per-timestamp speed statistics, its first and last ping (for the diffs
+across chunk boundaries, the distance and the trajectory features), its open stop and the
+vertices of its convex hull (the only points that can define the max spread). Ships wider than
+the hull projection keep a bounded set of extreme points instead (see max_spatial_spread.hull_points),
+so their streamed spread can be slightly below the exact one.
+
+Pings of a ship must arrive in time order across updates (inside an update any order is
+fine), as in a time-sorted AIS export, update() raises ValueError for older pings.
+Curvature needs the spline of the whole track and is left NaN.
+"""
+
+#name -> (dtype, default)
+STATE_FIELDS = {
+    'n_rows': (np.int64, 0),
+    'first_time': (np.int64, 0), 'first_lat': (float, np.nan), 'first_lon': (float, np.nan),
+    'last_time': (np.int64, 0), 'last_lat': (float, np.nan), 'last_lon': (float, np.nan),
+    'last_speed': (float, np.nan), 'last_heading': (float, np.nan),
+    'total_km': (float, 0.0),
+    'speed_max': (float, np.nan), 'speed_min': (float, np.nan),
+    #mean of the closed per-timestamp means
+    'means_n': (float, 0.0), 'means_sum': (float, 0.0),
+    #moments of the closed per-timestamp stds
+    'stds_n': (float, 0.0), 'stds_mean': (float, np.nan), 'stds_m2': (float, 0.0),
+    #moments of the speeds of the last timestamp, it can go on in the next update
+    'run_n': (float, 0.0), 'run_mean': (float, np.nan), 'run_m2': (float, 0.0),
+    'acc_n': (float, 0.0), 'acc_mean': (float, np.nan), 'acc_m2': (float, 0.0),
+    'acc_min': (float, np.nan), 'acc_max': (float, np.nan),
+    'rot_n': (float, 0.0), 'rot_mean': (float, np.nan), 'rot_m2': (float, 0.0),
+    'in_stop': (bool, False), 'stop_start': (np.int64, 0),
+    'num_stops': (np.int64, 0), 'total_stop': (float, 0.0), 'longest_stop': (float, 0.0),
+}
+
+
+class FeatureState:
+    def __init__(self,id_col,time_col,speed_col,heading_col,lat_col,lon_col,
+                 stop_speed_threshold=0.5,min_stop_duration=300,method='haversine',time_format=None):
+        self.id_col = id_col
+        self.time_col = time_col
+        self.speed_col = speed_col
+        self.heading_col = heading_col
+        self.lat_col = lat_col
+        self.lon_col = lon_col
+        self.stop_speed_threshold = stop_speed_threshold
+        self.min_stop_duration = min_stop_duration
+        self.method = method
+        #format of the time column of the updates, as in utils.time_utils.parse_time
+        self.time_format = time_format
+        self.ids = pd.Index([])
+        self.arrays = {name: np.empty(0, dtype=dtype) for name, (dtype, _) in STATE_FIELDS.items()}
+        #id -> (lat, lon) of the hull vertices (extreme points for wide ships)
+        self.hulls = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _positions(self,ids):
+        positions = self.ids.get_indexer(ids)
+        new = positions < 0
+        if new.any():
+            positions[new] = np.arange(len(self.ids), len(self.ids) + new.sum())
+            self.ids = self.ids.append(pd.Index(ids[new]))
+            for name, (dtype, default) in STATE_FIELDS.items():
+                self.arrays[name] = np.concatenate((self.arrays[name], np.full(new.sum(), default, dtype=dtype)))
+        return positions
+
+    def update(self,df):
+        """
+        df: the new pings (DataFrame or TrajectoryFrame)
+        """
+        #states saved before time_format existed detect the format
+        frame = TrajectoryFrame.from_dataframe(df,self.id_col,self.time_col,
+                                               columns=[self.speed_col,self.heading_col,self.lat_col,self.lon_col],
+                                               time_format=getattr(self,'time_format',None))
+        for col in (self.speed_col,self.heading_col,self.lat_col,self.lon_col):
+            if col not in frame.columns:
+                raise ValueError(f"{col} not in dataset")
+        if frame.n_groups == 0:
+            return self
+        late = self.late_ids(frame)
+        if len(late):
+            raise ValueError(f"{len(late)} ships have pings older than their last seen ping, "
+                             "drop() them and update() with their whole track instead")
+
+        pos = self._positions(frame.ids)
+        prev = {name: values[pos] for name, values in self.arrays.items()}
+        new = {}
+        has_prev = prev['n_rows'] > 0
+        starts, last = frame.starts, frame.ends - 1
+        times = frame.times
+        speed = np.asarray(frame[self.speed_col], dtype=float)
+        heading = np.asarray(frame[self.heading_col], dtype=float)
+        lat = np.asarray(frame[self.lat_col], dtype=float)
+        lon = np.asarray(frame[self.lon_col], dtype=float)
+
+        #the first ping of a known ship diffs against its last ping of the previous update
+        time_diff = frame.time_diff / 1e9
+        time_diff[starts] = np.where(has_prev, (times[starts] - prev['last_time']) / 1e9, 1)
+
+        new['n_rows'] = prev['n_rows'] + frame.counts
+        new['first_time'] = np.where(has_prev, prev['first_time'], times[starts])
+        new['first_lat'] = np.where(has_prev, prev['first_lat'], lat[starts])
+        new['first_lon'] = np.where(has_prev, prev['first_lon'], lon[starts])
+        new['last_time'], new['last_lat'], new['last_lon'] = times[last], lat[last], lon[last]
+        new['last_speed'], new['last_heading'] = speed[last], heading[last]
+
+        seg = segment_distances_km(lat, lon, starts=starts, method=self.method)
+        link = distance_km(prev['last_lat'], prev['last_lon'], lat[starts], lon[starts], method=self.method)
+        seg[starts] = np.where(has_prev, link, 0.0)
+        new['total_km'] = prev['total_km'] + np.add.reduceat(seg, starts)
+
+        new.update(self._acceleration_rot(frame, prev, has_prev, speed, heading, time_diff))
+        new.update(self._speed(frame, prev, has_prev, speed))
+        new.update(self._stops(frame, prev, has_prev, speed))
+
+        for name, values in new.items():
+            self.arrays[name][pos] = values
+        self._update_hulls(frame, lat, lon)
+        return self
+
+    def late_ids(self,frame):
+        """
+        Ids of the ships of frame (TrajectoryFrame) whose first ping is older than the last one in the state
+        """
+        positions = self.ids.get_indexer(frame.ids)
+        known = positions >= 0
+        late = np.zeros(frame.n_groups, dtype=bool)
+        late[known] = frame.times[frame.starts[known]] < self.arrays['last_time'][positions[known]]
+        return frame.ids[late]
+
+    def drop(self,ids):
+        """
+        Forgets the ships in ids (e.g. to rebuild them from their whole track)
+        """
+        keep = ~self.ids.isin(ids)
+        self.ids = self.ids[keep]
+        for name in STATE_FIELDS:
+            self.arrays[name] = self.arrays[name][keep]
+        for ship in ids:
+            self.hulls.pop(ship, None)
+        return self
+
+    def merge(self,other):
+        """
+        Adds the ships of another state (e.g. built on a different shard of ships).
+        Ships present in both would need the pings in between, so they are not allowed.
+        """
+        common = self.ids.intersection(other.ids)
+        if len(common):
+            raise ValueError(f"{len(common)} ids are in both states, update() one state with the new pings instead")
+        self.ids = self.ids.append(other.ids)
+        for name in STATE_FIELDS:
+            self.arrays[name] = np.concatenate((self.arrays[name], other.arrays[name]))
+        self.hulls.update(other.hulls)
+        return self
+
+    def save(self,filepath):
+        directory = os.path.dirname(filepath)
+        if directory:
+            os.makedirs(directory,exist_ok=True)
+        with open(filepath,'wb') as f:
+            pickle.dump(self,f)
+
+    @staticmethod
+    def load(filepath):
+        with open(filepath,'rb') as f:
+            return pickle.load(f)
+
+    def _acceleration_rot(self,frame,prev,has_prev,speed,heading,time_diff):
+        starts = frame.starts
+        speed_diff = np.empty(len(speed))
+        speed_diff[1:] = speed[1:] - speed[:-1]
+        speed_diff[starts] = np.where(has_prev, speed[starts] - prev['last_speed'], 0)
+        speed_diff[np.isnan(speed_diff)] = 0
+        heading_diff = np.empty(len(heading))
+        heading_diff[1:] = heading[1:] - heading[:-1]
+        heading_diff[starts] = np.where(has_prev, heading[starts] - prev['last_heading'], np.nan)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            acc = segment_stats(speed_diff / time_diff, starts)
+            rot = segment_stats(heading_diff / time_diff, starts)
+        new = {}
+        new['acc_n'], new['acc_mean'], new['acc_m2'] = merge_moments(
+            prev['acc_n'], prev['acc_mean'], prev['acc_m2'], acc['count'], acc['mean'], acc['m2'])
+        new['acc_min'] = np.fmin(prev['acc_min'], acc['min'])
+        new['acc_max'] = np.fmax(prev['acc_max'], acc['max'])
+        new['rot_n'], new['rot_mean'], new['rot_m2'] = merge_moments(
+            prev['rot_n'], prev['rot_mean'], prev['rot_m2'], rot['count'], rot['mean'], rot['m2'])
+        return new
+
+    def _speed(self,frame,prev,has_prev,speed):
+        """
+        Per-timestamp speed statistics: closed timestamps are folded into the running
+        mean of means and the moments of stds, the last timestamp of every ship stays open.
+        """
+        starts, ends = frame.starts, frame.ends
+        times = frame.times
+        new_run = frame.is_start
+        new_run[1:] |= times[1:] != times[:-1]
+        run_starts = np.flatnonzero(new_run)
+        runs = segment_stats(speed, run_starts)
+        first_run = np.searchsorted(run_starts, starts)
+        last_run = np.searchsorted(run_starts, ends) - 1
+
+        #the open timestamp of the previous update goes on when the first ping has the same time
+        continues = has_prev & (times[starts] == prev['last_time'])
+        n, mean, m2 = runs['count'].astype(float), runs['mean'], runs['m2']
+        n[first_run], mean[first_run], m2[first_run] = merge_moments(
+            np.where(continues, prev['run_n'], 0.0), prev['run_mean'], prev['run_m2'],
+            n[first_run], mean[first_run], m2[first_run])
+
+        closed = np.ones(len(run_starts), dtype=bool)
+        closed[last_run] = False
+        means = np.where(closed & (n > 0), mean, np.nan)
+        stds = np.where(closed, moments_std(n, m2), np.nan)
+
+        new = {}
+        closes_prev = has_prev & ~continues
+        new['means_n'], new['means_sum'] = _fold_mean(prev['means_n'], prev['means_sum'],
+                                                     np.where(closes_prev, prev['run_n'], 0.0), prev['run_mean'])
+        means = segment_stats(means, first_run)
+        new['means_n'] = new['means_n'] + means['count']
+        new['means_sum'] = new['means_sum'] + np.where(means['count'] > 0, means['mean'] * means['count'], 0.0)
+
+        stds_n, stds_mean, stds_m2 = _fold_std(prev['stds_n'], prev['stds_mean'], prev['stds_m2'],
+                                               np.where(closes_prev, prev['run_n'], 0.0), prev['run_m2'])
+        stds = segment_stats(stds, first_run)
+        new['stds_n'], new['stds_mean'], new['stds_m2'] = merge_moments(
+            stds_n, stds_mean, stds_m2, stds['count'], stds['mean'], stds['m2'])
+
+        new['run_n'], new['run_mean'], new['run_m2'] = n[last_run], mean[last_run], m2[last_run]
+        new['speed_max'] = np.fmax(prev['speed_max'], segment_max(speed, starts))
+        new['speed_min'] = np.fmin(prev['speed_min'], segment_min(speed, starts))
+        return new
+
+    def _stops(self,frame,prev,has_prev,speed):
+        starts, ends = frame.starts, frame.ends
+        times = frame.times
+        low = speed <= self.stop_speed_threshold
+        boundary = frame.is_start
+        boundary[1:] |= low[1:] != low[:-1]
+        run_starts = np.flatnonzero(boundary)
+        run_stops = np.r_[run_starts[1:], frame.n_rows]
+        run_group = np.searchsorted(frame.offsets, run_starts, side='right') - 1
+        is_first = run_starts == starts[run_group]
+        is_last = run_stops == ends[run_group]
+        run_low = low[run_starts]
+
+        carried = has_prev & prev['in_stop']
+        start_time = times[run_starts]
+        goes_on = is_first & run_low & carried[run_group]
+        start_time[goes_on] = prev['stop_start'][run_group[goes_on]]
+
+        #low runs closed by the next (moving) ping inside this update
+        closed = run_low & ~is_last
+        groups = [run_group[closed]]
+        durations = [(times[np.minimum(run_stops[closed], frame.n_rows - 1)] - start_time[closed]) / 1e9]
+        #stops of the previous update closed by a moving first ping
+        ended = carried & ~low[starts]
+        groups.append(np.flatnonzero(ended))
+        durations.append((times[starts[ended]] - prev['stop_start'][ended]) / 1e9)
+
+        groups = np.concatenate(groups)
+        durations = np.concatenate(durations)
+        valid = durations >= self.min_stop_duration
+        groups, durations = groups[valid], durations[valid]
+
+        longest = prev['longest_stop'].copy()
+        np.maximum.at(longest, groups, durations)
+        last_run = np.flatnonzero(is_last)
+        return {
+            'num_stops': prev['num_stops'] + np.bincount(groups, minlength=frame.n_groups),
+            'total_stop': prev['total_stop'] + np.bincount(groups, weights=durations, minlength=frame.n_groups),
+            'longest_stop': longest,
+            'in_stop': run_low[last_run],
+            'stop_start': np.where(run_low[last_run], start_time[last_run], 0)
+        }
+
+    def _update_hulls(self,frame,lat,lon):
+        for g, (s, e) in enumerate(zip(frame.starts, frame.ends)):
+            ship = frame.ids[g]
+            ship_lat, ship_lon = lat[s:e], lon[s:e]
+            if ship in self.hulls:
+                ship_lat = np.concatenate((self.hulls[ship][0], ship_lat))
+                ship_lon = np.concatenate((self.hulls[ship][1], ship_lon))
+            vertices = hull_points(ship_lat, ship_lon)
+            self.hulls[ship] = (ship_lat[vertices], ship_lon[vertices])
+
+    def to_features(self,ids=None):
+        """
+        Feature table of every ship seen so far (or only of ids), same columns as get_all_features.
+        Open timestamps and open stops are counted as if the data ended here,
+        without changing the state.
+        """
+        id_col = self.id_col
+        if ids is None:
+            positions = np.arange(len(self.ids))
+        else:
+            positions = self.ids.get_indexer(pd.Index(ids).unique())
+            if (positions < 0).any():
+                raise ValueError("Some ids are not in the state")
+        order = positions[np.argsort(self.ids.to_numpy()[positions], kind='stable')] if len(positions) else positions
+        ids = self.ids.to_numpy()[order]
+        a = {name: values[order] for name, values in self.arrays.items()}
+
+        means_n, means_sum = _fold_mean(a['means_n'], a['means_sum'], a['run_n'], a['run_mean'])
+        stds_n, stds_mean, stds_m2 = _fold_std(a['stds_n'], a['stds_mean'], a['stds_m2'], a['run_n'], a['run_m2'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_speed = np.where(means_n > 0, means_sum / means_n, np.nan)
+        features = pd.DataFrame({id_col: ids})
+        features = features.assign(**dict(zip(SPEED_COLUMNS, (
+            avg_speed, a['speed_max'], a['speed_min'], moments_std(stds_n, stds_m2)))))
+        features = features.assign(**dict(zip(ACCELERATION_COLUMNS, (
+            np.where(a['acc_n'] > 0, a['acc_mean'], np.nan), a['acc_max'], a['acc_min'],
+            moments_std(a['acc_n'], a['acc_m2'])))))
+        features = features.assign(**dict(zip(ROT_COLUMNS, (
+            np.where(a['rot_n'] > 0, a['rot_mean'], np.nan), moments_std(a['rot_n'], a['rot_m2'])))))
+
+        #first and last ping of every ship are enough for the trajectory features
+        ends = TrajectoryFrame(id_col, self.time_col, ids, np.arange(0, 2 * len(ids) + 1, 2),
+                               {self.time_col: np.column_stack((a['first_time'], a['last_time'])).ravel().view('datetime64[ns]'),
+                                self.lat_col: np.column_stack((a['first_lat'], a['last_lat'])).ravel(),
+                                self.lon_col: np.column_stack((a['first_lon'], a['last_lon'])).ravel()})
+        traj = trajectory(ends, id_col, self.time_col, self.lat_col, self.lon_col)
+
+        direct = distance_km(a['first_lat'], a['first_lon'], a['last_lat'], a['last_lon'], method=self.method)
+        distance_metrics = _metrics_from_distances(ids, a['total_km'], direct, id_col)
+
+        hulls = [self.hulls[ship] for ship in ids]
+        lengths = np.array([len(h[0]) for h in hulls], dtype=np.int64)
+        hull_starts = np.cumsum(lengths) - lengths
+        hull_lat = np.concatenate([h[0] for h in hulls]) if hulls else np.zeros(0)
+        hull_lon = np.concatenate([h[1] for h in hulls]) if hulls else np.zeros(0)
+        spread = _max_spread_per_group(hull_starts, hull_lat, hull_lon, method=self.method)
+
+        open_stop = (a['last_time'] - a['stop_start']) / 1e9
+        open_stop = np.where(a['in_stop'] & (open_stop >= self.min_stop_duration), open_stop, np.nan)
+        stops = pd.DataFrame({
+            id_col: ids,
+            'num_stops': a['num_stops'] + ~np.isnan(open_stop),
+            'total_stop_duration': a['total_stop'] + np.nan_to_num(open_stop),
+            'longest_stop_duration': np.fmax(a['longest_stop'], open_stop)
+        })
+
+        curvature = pd.DataFrame(np.nan, index=range(len(ids)), columns=CURVATURE_COLUMNS)
+        curvature.insert(0, id_col, ids)
+
+        return (features.merge(traj,on=id_col)
+                .merge(distance_metrics,on=id_col)
+                .merge(pd.DataFrame({id_col: ids, 'max_spatial_spread': spread}),on=id_col)
+                .merge(curvature,on=id_col)
+                .merge(stops,on=id_col)
+                )
+
+#fold a closed timestamp (n speeds, mean) into the running mean of means
+def _fold_mean(means_n,means_sum,run_n,run_mean):
+    has_mean = run_n > 0
+    return means_n + has_mean, means_sum + np.where(has_mean, run_mean, 0.0)
+
+#fold a closed timestamp (n speeds, m2) into the moments of the stds
+def _fold_std(stds_n,stds_mean,stds_m2,run_n,run_m2):
+    has_std = run_n > 1
+    return merge_moments(stds_n, stds_mean, stds_m2,
+                         has_std.astype(float), moments_std(run_n, run_m2), np.zeros(len(run_n)))
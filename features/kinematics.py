@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from utils.trajectory_frame import TrajectoryFrame
+from utils.segment_ops import segment_stats
+
+"""
+Speed, acceleration and ROT statistics computed together over the sorted arrays
+of a TrajectoryFrame: the time deltas and group offsets are shared and every
+statistic is a segmented reduction, so the data is scanned once instead of three times.
+"""
+
+SPEED_COLUMNS = ['avg_speed','max_speed','min_speed','std_speed']
+ACCELERATION_COLUMNS = ['avg_acceleration','max_acceleration','min_acceleration','std_acceleration']
+ROT_COLUMNS = ['rot_mean','rot_std']
+
+
+def kinematics_per_id(df,id_col,time_col,speed_col,heading_col):
+    for col in (id_col,time_col,speed_col,heading_col):
+        if col not in df.columns:
+            raise ValueError(f"{col} not in dataset")
+    frame = TrajectoryFrame.from_dataframe(df,id_col,time_col,columns=[speed_col,heading_col])
+
+    speed = np.asarray(frame[speed_col], dtype=float)
+    time_diff = _time_diff_seconds(frame)
+    features = {id_col: frame.ids}
+    features.update(_speed_stats(frame, speed))
+    features.update(_acceleration_stats(frame, speed, time_diff))
+    features.update(_rot_stats(frame, np.asarray(frame[heading_col], dtype=float), time_diff))
+    return pd.DataFrame(features)
+
+#seconds since the previous ping of the same id, 1 for the first ping
+def _time_diff_seconds(frame):
+    time_diff = frame.time_diff / 1e9
+    time_diff[frame.starts] = 1
+    return time_diff
+
+def _diff(values, starts, fill):
+    diff = np.empty(len(values))
+    diff[1:] = values[1:] - values[:-1]
+    diff[starts] = fill
+    return diff
+
+def _speed_stats(frame, speed):
+    """
+    Same as grouping by (id,time) and then by id: statistics of every timestamp
+    first, then mean of the means, max of the maxes, min of the mins and std of the stds.
+    """
+    times = frame.times
+    new_run = frame.is_start
+    new_run[1:] |= times[1:] != times[:-1]
+    run_starts = np.flatnonzero(new_run)
+    runs = segment_stats(speed, run_starts)
+
+    #offsets of every id in the run arrays
+    id_run_starts = np.searchsorted(run_starts, frame.starts)
+    return {
+        'avg_speed': segment_stats(runs['mean'], id_run_starts)['mean'],
+        'max_speed': segment_stats(runs['max'], id_run_starts)['max'],
+        'min_speed': segment_stats(runs['min'], id_run_starts)['min'],
+        'std_speed': segment_stats(runs['std'], id_run_starts)['std'],
+    }
+
+def _acceleration_stats(frame, speed, time_diff):
+    speed_diff = _diff(speed, frame.starts, 0)
+    speed_diff[np.isnan(speed_diff)] = 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats = segment_stats(speed_diff / time_diff, frame.starts)
+    return dict(zip(ACCELERATION_COLUMNS, (stats['mean'], stats['max'], stats['min'], stats['std'])))
+
+def _rot_stats(frame, heading, time_diff):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stats = segment_stats(_diff(heading, frame.starts, np.nan) / time_diff, frame.starts)
+    return dict(zip(ROT_COLUMNS, (stats['mean'], stats['std'])))
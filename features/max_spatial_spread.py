@@ -19,45 +19,223 @@ nxn πίνακα με όλες τις ανά δύο αποστάσεις του
 Γράφω τον κώδικα που χρειαζόμαστε και προσάρμοσέ τον όπως εσύ θεωρείς καλύτερα με βάση και τα υπόλοιπα που έχεις
 υλοποιήσει.
 """
-from sklearn.metrics import pairwise_distances as pwd
 from geopy.distance import geodesic
 import pandas as pd
 import numpy as np
 from scipy.spatial import ConvexHull , QhullError
+from utils.geo_utils import distance_km
+from utils.trajectory_frame import TrajectoryFrame
 
 #Haversine formula
 def haversine(x, y):
     return geodesic(x, y).meters
 
+"""
+Instead of the full distance_matrix of the hull we only look at the antipodal pairs of the
+hull (rotating calipers), which are O(h) instead of O(h^2), and evaluate all of them with
+one vectorized great-circle call. The hull is built on a gnomonic projection centered on the
+group, where great circles are straight lines, so the hull vertices are the ones on the sphere.
+The projection only covers the hemisphere around the center: groups with points too far from it
+fall back to an exact search that only compares the grid cells that can still hold a farther pair.
+"""
+
+#cos of the largest angle (60 degrees) from the center that is still projected, further out
+#the calipers on the projected hull can miss the farthest pair (checked against brute force)
+MIN_DEPTH = 0.5
+#bytes of one block of dot products in the searches over wide groups
+BLOCK_BYTES = 32 * 1024**2
+#side of the grid cells (in unit vector coordinates, ~3.6 degrees) of the exact search
+CELL_SIDE = 1 / 16
+#directions of the extreme points that the streaming state keeps for wide groups
+N_DIRECTIONS = 1024
+
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+#gnomonic projection around the mean direction, None when some point is not projectable
+def _project(lat, lon):
+    xyz = _unit_vectors(lat, lon)
+    center = xyz.mean(axis=0)
+    norm = np.linalg.norm(center)
+    if norm < 1e-12:
+        return None
+    center /= norm
+    #orthonormal basis of the tangent plane at the center
+    east = np.cross([0.0, 0.0, 1.0], center)
+    if np.linalg.norm(east) < 1e-12:
+        east = np.array([1.0, 0.0, 0.0])
+    east /= np.linalg.norm(east)
+    north = np.cross(center, east)
+    depth = xyz @ center
+    if depth.min() <= MIN_DEPTH:
+        return None
+    return np.column_stack((xyz @ east / depth, xyz @ north / depth))
+
+#rows of the blocks of a (rows x n) float64 matrix within BLOCK_BYTES
+def _block_rows(n):
+    return max(1, BLOCK_BYTES // (8 * max(n, 1)))
+
+#(i, j, a[i] @ b[j]) of the smallest dot product between the rows of a and b
+def _min_dot(a, b):
+    best = (0, 0, np.inf)
+    rows = _block_rows(len(b))
+    for s in range(0, len(a), rows):
+        dots = a[s:s + rows] @ b.T
+        i, j = np.unravel_index(np.argmin(dots), dots.shape)
+        if dots[i, j] < best[2]:
+            best = (s + i, j, dots[i, j])
+    return best
+
+#positions of the members of the given cells, cells are order[offsets[c]:offsets[c+1]]
+def _cell_members(order, offsets, cells):
+    starts, lengths = offsets[cells], offsets[cells + 1] - offsets[cells]
+    return order[np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())]
+
+#Exact farthest pair on the sphere (the smallest dot product of the unit vectors) over the
+#distinct positions (a stopped ship repeats the same one). The points are put in grid cells,
+#a first pair between one point of every cell gives a lower bound and only the cell pairs
+#whose centers and radii can beat the best chord so far are compared point by point.
+def _farthest_pair(lat, lon):
+    _, rows = np.unique(np.column_stack((lat, lon)), axis=0, return_index=True)
+    xyz = _unit_vectors(lat[rows], lon[rows])
+    _, cell = np.unique(np.floor(xyz / CELL_SIDE).astype(np.int64), axis=0, return_inverse=True)
+    cell = cell.ravel()
+    order = np.argsort(cell, kind='stable')
+    counts = np.bincount(cell)
+    offsets = np.r_[0, np.cumsum(counts)]
+    center = np.add.reduceat(xyz[order], offsets[:-1]) / counts[:, None]
+    radius = np.maximum.reduceat(np.linalg.norm(xyz[order] - center[cell[order]], axis=1), offsets[:-1])
+
+    firsts = order[offsets[:-1]]
+    i, j, best = _min_dot(xyz[firsts], xyz[firsts])
+    pair = (firsts[i], firsts[j])
+    for a in range(len(counts)):
+        chord = np.sqrt(max(2 - 2 * best, 0.0))
+        reach = np.linalg.norm(center[a:] - center[a], axis=1) + radius[a:] + radius[a]
+        partners = a + np.flatnonzero(reach > chord)
+        if not len(partners):
+            continue
+        points, others = order[offsets[a]:offsets[a + 1]], _cell_members(order, offsets, partners)
+        i, j, dot = _min_dot(xyz[points], xyz[others])
+        if dot < best:
+            best, pair = dot, (points[i], others[j])
+    return rows[np.array([pair], dtype=np.int64)]
+
+#Points of a wide group kept by the streaming state: the farthest pair and the extreme point
+#in each of N_DIRECTIONS directions spread over the sphere (Fibonacci lattice). A later
+#farthest pair that goes through a dropped point is underestimated at most by the cosine of
+#the angle between neighbouring directions.
+def _extreme_points(lat, lon):
+    xyz = _unit_vectors(lat, lon)
+    k = np.arange(N_DIRECTIONS) + 0.5
+    z = 1 - 2 * k / N_DIRECTIONS
+    phi = np.pi * (1 + 5**0.5) * k
+    directions = np.column_stack((np.sqrt(1 - z**2) * np.cos(phi), np.sqrt(1 - z**2) * np.sin(phi), z))
+    best, rows = np.full(N_DIRECTIONS, -np.inf), np.zeros(N_DIRECTIONS, dtype=np.int64)
+    step = _block_rows(N_DIRECTIONS)
+    for s in range(0, len(xyz), step):
+        dots = directions @ xyz[s:s + step].T
+        top = dots.argmax(axis=1)
+        top_dots = dots[np.arange(N_DIRECTIONS), top]
+        better = top_dots > best
+        best[better], rows[better] = top_dots[better], s + top[better]
+    return np.union1d(rows, _farthest_pair(lat, lon))
+
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+#Rotating calipers over a convex polygon given counter-clockwise
+def _antipodal_pairs(hull_xy):
+    h = len(hull_xy)
+    pairs = []
+    j = 1
+    for i in range(h):
+        ni = (i + 1) % h
+        while abs(_cross(hull_xy[i], hull_xy[ni], hull_xy[(j + 1) % h])) > abs(_cross(hull_xy[i], hull_xy[ni], hull_xy[j])):
+            j = (j + 1) % h
+        pairs.extend(((i, j), (ni, j), (i, (j + 1) % h)))
+    return np.array(pairs, dtype=np.int64)
+
+#Indices (into xy) of the hull vertices, the two extremes for collinear points
+def _hull_vertices(xy):
+    if len(xy) < 3:
+        return np.arange(len(xy))
+    try:
+        return ConvexHull(xy).vertices
+    except QhullError:
+        #Collinear or duplicated points: the spread is between the two extremes along the line
+        centered = xy - xy.mean(axis=0)
+        _, _, vt = np.linalg.svd(centered, full_matrices=False)
+        proj = centered @ vt[0]
+        return np.unique([proj.argmin(), proj.argmax()])
+
+#Points that can still define the max spread of a group, the rest can be dropped
+def hull_points(lat, lon):
+    if len(lat) < 3:
+        return np.arange(len(lat))
+    xy = _project(lat, lon)
+    if xy is None:
+        #wider than the projection: the extreme points in a fixed set of directions
+        return _extreme_points(lat, lon)
+    return _hull_vertices(xy)
+
+#Indices (into lat/lon) of the candidate pairs that can define the max spread of one group
+def _candidate_pairs(lat, lon):
+    if len(lat) < 2:
+        return np.empty((0, 2), dtype=np.int64)
+    xy = _project(lat, lon)
+    if xy is None:
+        return _farthest_pair(lat, lon)
+    vertices = _hull_vertices(xy)
+    if len(vertices) < 3:
+        return np.array([[vertices[0], vertices[-1]]], dtype=np.int64)
+    return vertices[_antipodal_pairs(xy[vertices])]
+
+def _max_spread_per_group(starts, lat, lon, method='haversine'):
+    """
+    starts: row offset where every group begins in lat/lon
+    Returns the max spread (meters) of every group.
+    """
+    pairs, owner = _candidate_pairs_per_group(starts, lat, lon)
+    return _spread_from_pairs(len(starts), pairs, owner, lat, lon, method=method)
+
+#candidate pairs (rows of lat/lon) of all the groups and the group that owns every pair
+def _candidate_pairs_per_group(starts, lat, lon):
+    ends = np.r_[starts[1:], len(lat)]
+    pairs, owner = [np.empty((0, 2), dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    for g, (s, e) in enumerate(zip(starts, ends)):
+        cand = _candidate_pairs(lat[s:e], lon[s:e]) + s
+        pairs.append(cand)
+        owner.append(np.full(len(cand), g))
+    return np.concatenate(pairs), np.concatenate(owner)
+
+def _spread_from_pairs(n_groups, pairs, owner, lat, lon, method='haversine'):
+    max_spread = np.zeros(n_groups, dtype=float)
+    if len(pairs):
+        d = distance_km(lat[pairs[:, 0]], lon[pairs[:, 0]], lat[pairs[:, 1]], lon[pairs[:, 1]], method=method) * 1000
+        np.maximum.at(max_spread, owner, d)
+    return max_spread
+
 #implementation of the example in the Data CSV
-def calculate_max_spread_per_group(group):
-    x = group[['lat','lon']].values
-
-    if len(x)< 3:
-        max_spread = 0.0
-    else:
-        try:
-            hull = ConvexHull(x)
-            hull_points = x[hull.vertices]
-            distance_matrix = pwd(hull_points,hull_points,metric=haversine)
-            max_spread= distance_matrix.max()
-        except QhullError:
-            max_spread = 0.0
+def calculate_max_spread_per_group(group, lat_col='lat', lon_col='lon', method='haversine'):
+    lat = group[lat_col].to_numpy(dtype=float)
+    lon = group[lon_col].to_numpy(dtype=float)
+    max_spread = _max_spread_per_group(np.array([0]), lat, lon, method=method)[0] if len(lat) else 0.0
     return pd.Series({
         'max_spatial_spread':max_spread
     }) 
 
 #Return the results with (id_col and the max_spatial_spread)
-def compute_max_spatial_spread(df,id_col,time_col,lat_col,lon_col):
+def compute_max_spatial_spread(df,id_col,time_col,lat_col,lon_col,method='haversine'):
     required_cols = [id_col,time_col, lat_col,lon_col]
     if not all (cols in df.columns for cols in required_cols):
         raise ValueError("Missing columns")
     
-    new_df = df.sort_values(by=[id_col,time_col])
-    result = new_df.groupby(id_col).apply(
-        lambda group: calculate_max_spread_per_group(group)
-    ).reset_index()
-    return result[[id_col,'max_spatial_spread']]
+    frame = TrajectoryFrame.from_dataframe(df,id_col,time_col,columns=[lat_col,lon_col])
+    max_spread = _max_spread_per_group(frame.starts, np.asarray(frame[lat_col], dtype=float),
+                                       np.asarray(frame[lon_col], dtype=float), method=method)
+    return pd.DataFrame({id_col: frame.ids, 'max_spatial_spread': max_spread})
 
 #simple example 
 def max_spread(df, ch=False):
@@ -71,40 +249,11 @@ def max_spread(df, ch=False):
     :rtype: float
     """
 
-    x = df[["lat", "lon"]].values
-
-    # Compute Convex Hull
-    hull = ConvexHull(x)
-    # Find the points that define the hull
-    hull_points = x[hull.vertices]
-
-    # Compute distance_matrix
-    distance_matrix = pwd(hull_points, hull_points, metric=haversine)
-
-    return distance_matrix.max()
+    return calculate_max_spread_per_group(df)['max_spatial_spread']
 
 # test
-data = pd.read_csv(r"C:\Users\user\Documents\Feature_Extraction\Feature_Extraction\ais.csv")
-data = data.loc[data.shipid == data.shipid.iloc[0]]
-
-max_spread(data)
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+if __name__ == "__main__":
+    data = pd.read_csv(r"C:\Users\user\Documents\Feature_Extraction\Feature_Extraction\ais.csv")
+    data = data.loc[data.shipid == data.shipid.iloc[0]]
 
+    print(max_spread(data))
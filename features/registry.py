@@ -0,0 +1,139 @@
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
+from utils.geo_utils import segment_distances_km
+from features.kinematics import SPEED_COLUMNS, ACCELERATION_COLUMNS, ROT_COLUMNS, _time_diff_seconds, _speed_stats, _acceleration_stats, _rot_stats
+from features.trajectory import TRAJECTORY_COLUMNS, trajectory
+from features.distance_and_straightness import DISTANCE_COLUMNS, _metrics_from_segments
+from features.max_spatial_spread import _candidate_pairs_per_group, _spread_from_pairs
+from features.curvature import CURVATURE_COLUMNS, curvature_results
+from features.stops import STOP_COLUMNS, count_stops
+
+"""
+Registry of every output column: the feature that produces it, the input columns
+(roles: speed, heading, lat, lon) it reads and the intermediate results it needs.
+plan() works out the minimal set for a list of output columns and FeatureContext
+computes every intermediate at most once, so e.g. acceleration and ROT share the
+time deltas and only the requested features are run.
+"""
+
+def _time_diff(ctx):
+    return _time_diff_seconds(ctx.frame)
+
+def _segment_distances(ctx):
+    return segment_distances_km(ctx.values('lat'), ctx.values('lon'), starts=ctx.frame.starts,
+                                method=ctx.params['distance']['method'])
+
+def _hull(ctx):
+    return _candidate_pairs_per_group(ctx.frame.starts, ctx.values('lat'), ctx.values('lon'))
+
+#name -> (input roles, intermediates it needs, function of the context)
+INTERMEDIATES = {
+    'time_diff': ((), (), _time_diff),
+    'segment_distances': (('lat', 'lon'), (), _segment_distances),
+    'hull': (('lat', 'lon'), (), _hull),
+}
+
+
+def _speed(ctx):
+    return _speed_stats(ctx.frame, ctx.values('speed'))
+
+def _acceleration(ctx):
+    return _acceleration_stats(ctx.frame, ctx.values('speed'), ctx.get('time_diff'))
+
+def _rot(ctx):
+    return _rot_stats(ctx.frame, ctx.values('heading'), ctx.get('time_diff'))
+
+def _trajectory(ctx):
+    return trajectory(ctx.frame, ctx.id_col, ctx.time_col, ctx.roles['lat'], ctx.roles['lon'])
+
+def _distance(ctx):
+    return _metrics_from_segments(ctx.frame.ids, ctx.frame.starts, ctx.values('lat'), ctx.values('lon'),
+                                  ctx.get('segment_distances'), ctx.id_col, method=ctx.params['distance']['method'])
+
+def _spread(ctx):
+    pairs, owner = ctx.get('hull')
+    spread = _spread_from_pairs(ctx.frame.n_groups, pairs, owner, ctx.values('lat'), ctx.values('lon'),
+                                method=ctx.params['spread']['method'])
+    return {'max_spatial_spread': spread}
+
+def _curvature(ctx):
+    return curvature_results(ctx.frame, ctx.id_col, ctx.time_col, ctx.roles['lat'], ctx.roles['lon'],
+                             **ctx.params['curvature'])
+
+def _stops(ctx):
+    return count_stops(ctx.frame, ctx.id_col, ctx.time_col, ctx.roles['lat'], ctx.roles['lon'], ctx.roles['speed'],
+                       **ctx.params['stops'])
+
+#name -> (output columns, input roles, intermediates it needs, function of the context)
+FEATURES = {
+    'speed': (SPEED_COLUMNS, ('speed',), (), _speed),
+    'acceleration': (ACCELERATION_COLUMNS, ('speed',), ('time_diff',), _acceleration),
+    'rot': (ROT_COLUMNS, ('heading',), ('time_diff',), _rot),
+    'trajectory': (TRAJECTORY_COLUMNS, ('lat', 'lon'), (), _trajectory),
+    'distance': (DISTANCE_COLUMNS, ('lat', 'lon'), ('segment_distances',), _distance),
+    'spread': (['max_spatial_spread'], ('lat', 'lon'), ('hull',), _spread),
+    'curvature': (CURVATURE_COLUMNS, ('lat', 'lon'), (), _curvature),
+    'stops': (STOP_COLUMNS, ('lat', 'lon', 'speed'), (), _stops),
+}
+
+#output column -> feature that computes it
+COLUMN_FEATURES = {col: name for name, (columns, _, _, _) in FEATURES.items() for col in columns}
+
+
+def plan(columns):
+    """
+    Returns the features, the intermediates and the input roles needed
+    for the given output columns
+    """
+    unknown = [col for col in columns if col not in COLUMN_FEATURES]
+    if unknown:
+        raise ValueError(f"Unknown feature columns {unknown}. Choose from: {list(COLUMN_FEATURES)}")
+    features = list(dict.fromkeys(COLUMN_FEATURES[col] for col in columns))
+    intermediates = list(dict.fromkeys(dep for name in features for dep in FEATURES[name][2]))
+    roles = [role for name in features for role in FEATURES[name][1]]
+    roles += [role for name in intermediates for role in INTERMEDIATES[name][0]]
+    return features, intermediates, list(dict.fromkeys(roles))
+
+
+class FeatureContext:
+    """
+    frame: TrajectoryFrame with (at least) the input columns
+    roles: role -> column name (speed, heading, lat, lon)
+    params: feature name -> keyword parameters (DataTransformer.feature_params)
+    stage: optional stage(name,rows,groups) context manager wrapped around every feature,
+           the intermediates count in the feature that first needs them
+    """
+    def __init__(self,frame,roles,params,stage=None):
+        self.frame = frame
+        self.id_col = frame.id_col
+        self.time_col = frame.time_col
+        self.roles = roles
+        self.params = params
+        self.stage = stage or (lambda name, rows=None, groups=None: nullcontext())
+        self._results = {}
+
+    def values(self,role):
+        return np.asarray(self.frame[self.roles[role]], dtype=float)
+
+    #computed on first use and shared afterwards
+    def get(self,name):
+        if name not in self._results:
+            self._results[name] = INTERMEDIATES[name][2](self)
+        return self._results[name]
+
+    def compute(self,columns):
+        """
+        Table with the id and the given output columns (in that order), one row per id
+        """
+        columns = list(dict.fromkeys(columns))
+        features, _, _ = plan(columns)
+        result = {self.id_col: self.frame.ids}
+        for name in features:
+            with self.stage(name,rows=self.frame.n_rows,groups=self.frame.n_groups):
+                values = FEATURES[name][3](self)
+            for col in FEATURES[name][0]:
+                if col in columns:
+                    result[col] = values[col].to_numpy() if isinstance(values, pd.DataFrame) else values[col]
+        with self.stage('merge',rows=self.frame.n_groups,groups=self.frame.n_groups):
+            return pd.DataFrame(result)[[self.id_col, *columns]]
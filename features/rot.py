@@ -1,4 +1,7 @@
-from utils.time_utils import categorize_time
+import numpy as np
+import pandas as pd
+from utils.trajectory_frame import TrajectoryFrame
+from features.kinematics import _rot_stats, _time_diff_seconds
 
 def rot_per_id(df,head_col,id_col,time_col):
     if head_col not in df.columns:
@@ -8,13 +11,7 @@ def rot_per_id(df,head_col,id_col,time_col):
     if id_col not in df.columns:
         raise ValueError(f'{id_col} not in dataset')
     
-    df = categorize_time(df,time_col)
-    new_df = df.copy()
-    new_df = new_df.sort_values(by=[id_col,time_col])
-    new_df['heading_diff'] = new_df.groupby(id_col)[head_col].diff()
-    new_df['time_diff'] = new_df.groupby(id_col)[time_col].diff().dt.total_seconds().fillna(1)
-    new_df['ROT'] =new_df['heading_diff']/new_df['time_diff']
-    return new_df.groupby(id_col)['ROT'].agg(
-        rot_mean='mean',
-        rot_std = 'std'
-    ).reset_index()
+    frame = TrajectoryFrame.from_dataframe(df,id_col,time_col,columns=[head_col])
+    features = {id_col: frame.ids}
+    features.update(_rot_stats(frame, np.asarray(frame[head_col], dtype=float), _time_diff_seconds(frame)))
+    return pd.DataFrame(features)
@@ -1,23 +1,14 @@
+import numpy as np
 import pandas as pd
-from utils.time_utils import categorize_time
+from utils.trajectory_frame import TrajectoryFrame
+from features.kinematics import _speed_stats
 
 
 def average_speed_per_id(df,id_col,time_col,speed_col):
-    df = categorize_time(df,time_col)
-    new_df = df.copy()
+    frame = TrajectoryFrame.from_dataframe(df,id_col,time_col,columns=[speed_col])
+    if speed_col not in frame.columns:
+        raise ValueError(f"{speed_col} not in dataset")
 
-    aggregate = new_df.groupby([id_col,time_col])[speed_col].agg(
-        avg_speed='mean',
-        max_speed='max',
-        min_speed='min',
-        std_speed='std'
-    ).reset_index()
-
-    return aggregate.groupby(id_col).agg(
-        {
-            "avg_speed":"mean",
-            "max_speed":"max",
-            "min_speed":"min",
-            "std_speed":"std"
-        }
-    ).reset_index()
\ No newline at end of file
+    features = {id_col: frame.ids}
+    features.update(_speed_stats(frame, np.asarray(frame[speed_col], dtype=float)))
+    return pd.DataFrame(features)
@@ -1,41 +1,86 @@
+import numpy as np
 import pandas as pd
+from utils.trajectory_frame import TrajectoryFrame
+
+STOP_COLUMNS = ['num_stops', 'total_stop_duration', 'longest_stop_duration']
 
 def count_stops(df,id_col,time_col,lat_col,lon_col,speed_col,stop_speed_threshold=0.5,min_stop_duration=300):
     """
         Group data by shipid and compute the stops for every shipid
+        A stop is a run of consecutive pings with speed <= stop_speed_threshold that lasts
+        at least min_stop_duration seconds (until the next moving ping, or the last ping).
+        Returns num_stops, total_stop_duration and longest_stop_duration (seconds) per id
     """
-    required_cols = [id_col,time_col,lat_col,lon_col]
+    frame = _stops_frame(df,id_col,time_col,lat_col,lon_col,speed_col)
+    runs = _stop_runs(frame,speed_col,stop_speed_threshold,min_stop_duration)
+
+    num_stops = np.bincount(runs['group'], minlength=frame.n_groups)
+    total = np.bincount(runs['group'], weights=runs['duration'], minlength=frame.n_groups)
+    longest = np.zeros(frame.n_groups)
+    np.maximum.at(longest, runs['group'], runs['duration'])
+
+    return pd.DataFrame({
+        id_col: frame.ids,
+        'num_stops': num_stops,
+        'total_stop_duration': total,
+        'longest_stop_duration': longest
+    })
+
+def stop_events(df,id_col,time_col,lat_col,lon_col,speed_col,stop_speed_threshold=0.5,min_stop_duration=300):
+    """
+        One row for every stop: id, start/end time, duration in seconds
+        and the mean position of the pings of the stop
+    """
+    frame = _stops_frame(df,id_col,time_col,lat_col,lon_col,speed_col)
+    runs = _stop_runs(frame,speed_col,stop_speed_threshold,min_stop_duration)
+
+    times = frame[time_col]
+    lengths = runs['stop'] - runs['start']
+    lat_sum = np.r_[0.0, np.cumsum(np.asarray(frame[lat_col], dtype=float))]
+    lon_sum = np.r_[0.0, np.cumsum(np.asarray(frame[lon_col], dtype=float))]
+
+    return pd.DataFrame({
+        id_col: frame.ids[runs['group']],
+        'start_time': times[runs['start']],
+        'end_time': times[runs['end']],
+        'duration_second': runs['duration'],
+        'lat': (lat_sum[runs['stop']] - lat_sum[runs['start']]) / lengths,
+        'lon': (lon_sum[runs['stop']] - lon_sum[runs['start']]) / lengths
+    })
+
+def _stops_frame(df,id_col,time_col,lat_col,lon_col,speed_col):
+    required_cols = [id_col,time_col,lat_col,lon_col,speed_col]
     if not all(col in df.columns for col in required_cols):
         raise ValueError("Missing one or more required columns")
-    new_df = df.sort_values(by=[id_col,time_col])
-
-    result = new_df.groupby(id_col).apply(
-        lambda group: _compute_stops(group,time_col,speed_col,stop_speed_threshold,min_stop_duration)
-    ).reset_index()
-
-    return result[[id_col,'num_stops']]
-
-
-def _compute_stops(group,time_col,speed_col,stop_speed_threshold,min_stop_duration):
-    stop_count = 0
-    in_stop = False
-    stop_start_time = None 
-
-    for i, row in group.iterrows():
-        if row[speed_col] <= stop_speed_threshold:
-            if not in_stop:
-                in_stop= True 
-                stop_start_time = row[time_col]
-            else:
-                if in_stop:
-                    stop_duration = (row[time_col]-stop_start_time).total_seconds()
-                    if stop_duration >= min_stop_duration:
-                        stop_duration +=1
-                    in_stop = False
-        
-    if in_stop:
-        stop_duration = (group.iloc[-1][time_col]-stop_start_time).total_seconds()
-        if stop_duration >= min_stop_duration:
-            stop_count+=1
-        
-    return pd.Series({'num_stops':stop_count})
+    return TrajectoryFrame.from_dataframe(df,id_col,time_col,columns=[lat_col,lon_col,speed_col])
+
+def _stop_runs(frame,speed_col,stop_speed_threshold,min_stop_duration):
+    """
+    Run-length encoding of the low speed pings over the whole sorted frame.
+    For every stop returns the group, the first row, the row after the last ping of the
+    stop (stop), the row that ends it (end: next ping, or last ping of the id) and the duration.
+    """
+    n = frame.n_rows
+    low = np.asarray(frame[speed_col], dtype=float) <= stop_speed_threshold
+    is_start = frame.is_start
+    boundary = is_start.copy()
+    boundary[1:] |= low[1:] != low[:-1]
+    run_starts = np.flatnonzero(boundary)
+    run_stops = np.r_[run_starts[1:], n]
+
+    keep = low[run_starts]
+    start, stop = run_starts[keep], run_stops[keep]
+    #a stop that reaches the end of its id ends at its own last ping
+    ended_by_group = (stop == n) | is_start[np.minimum(stop, n - 1)]
+    end = np.where(ended_by_group, stop - 1, stop)
+
+    times = frame.times
+    duration = (times[end] - times[start]) / 1e9
+    valid = duration >= min_stop_duration
+    return {
+        'group': np.searchsorted(frame.offsets, start[valid], side='right') - 1,
+        'start': start[valid],
+        'stop': stop[valid],
+        'end': end[valid],
+        'duration': duration[valid]
+    }
@@ -1,19 +1,25 @@
 import pandas as pd 
+from utils.trajectory_frame import TrajectoryFrame
+
+TRAJECTORY_COLUMNS = ['start_lat', 'start_lon', 'end_lat', 'end_lon',
+                      'start_time', 'end_time', 'duration_second',
+                      'start_year', 'start_month', 'start_day', 'start_hour', 'start_minute',
+                      'end_year', 'end_month', 'end_day', 'end_hour', 'end_minute']
 
 
 def trajectory(df,id_col,time_col,lat_col,long_col):
-    new_df = df.copy()
-    new_df[time_col] = pd.to_datetime(new_df[time_col])
-    grouped = new_df.sort_values([id_col,time_col]).groupby(id_col)
+    frame = TrajectoryFrame.from_dataframe(df,id_col,time_col,columns=[lat_col,long_col])
+    first, last = frame.starts, frame.ends - 1
 
-    features = grouped.agg(
-        start_lat=(lat_col, 'first'),
-        start_long=(long_col, 'first'),
-        end_lat=(lat_col, 'last'),
-        end_long=(long_col, 'last'),
-        start_time=(time_col, 'first'),
-        end_time=(time_col, 'last')
-    )
+    features = pd.DataFrame({
+        id_col: frame.ids,
+        'start_lat': frame[lat_col][first],
+        'start_lon': frame[long_col][first],
+        'end_lat': frame[lat_col][last],
+        'end_lon': frame[long_col][last],
+        'start_time': frame[time_col][first],
+        'end_time': frame[time_col][last]
+    })
     #Travelling Time and Location Information for every feature
     features['duration_second'] = (features['end_time']-features['start_time']).dt.total_seconds()
     features['duration_hour'] = features['duration_second']/3600
@@ -28,9 +34,4 @@ def trajectory(df,id_col,time_col,lat_col,long_col):
     features['end_hour'] = features['end_time'].dt.hour
     features['end_minute'] = features['end_time'].dt.minute
     
-    features = features.reset_index()
-    return features[[self.id_col, 'start_lat', 'start_lon', 'end_lat', 'end_lon',
-           'start_time', 'end_time', 'duration_second',
-           'start_year', 'start_month', 'start_day', 'start_hour', 'start_minute',
-           'end_year', 'end_month', 'end_day', 'end_hour', 'end_minute'
-           ]]
+    return features[[id_col, *TRAJECTORY_COLUMNS]]
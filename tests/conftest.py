@@ -0,0 +1,5 @@
+import os
+import sys
+
+#the modules import each other from the repository root (from utils..., from features...)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
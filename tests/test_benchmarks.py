@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.run import BENCHMARKS, TIERS
+from benchmarks.synthetic import generate_ais
+
+#std of the per-timestamp speed stds: NaN when every ping of a ship has its own timestamp
+MAY_BE_NAN = {'std_speed'}
+
+
+@pytest.fixture(scope='module')
+def data():
+    return generate_ais(*TIERS['1k'], seed=0)
+
+@pytest.mark.parametrize('name', list(BENCHMARKS))
+def test_benchmark_output_is_finite(name, data):
+    features = BENCHMARKS[name](data)
+    assert isinstance(features, pd.DataFrame)
+    assert len(features) == TIERS['1k'][0]
+    numeric = features.select_dtypes('number').drop(columns=MAY_BE_NAN, errors='ignore')
+    assert len(numeric.columns)
+    bad = numeric.columns[~np.isfinite(numeric.to_numpy(dtype=float)).all(axis=0)]
+    assert not len(bad), f'{name}: non finite {list(bad)}'
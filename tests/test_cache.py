@@ -0,0 +1,38 @@
+import os
+import pytest
+from DataTransform import DataTransformer, MODE_FAMILIES
+from benchmarks.synthetic import generate_ais
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / 'ais.csv'
+    generate_ais(n_ships=5, pings_per_ship=40, seed=2).to_csv(path, index=False)
+    return str(path)
+
+def _cache_files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if not name.endswith('.tmp'))
+
+def test_cached_features_hit_on_the_same_instance(dataset, tmp_path, capsys):
+    cache_dir = str(tmp_path / 'cache')
+    transformer = DataTransformer(dataset)
+    first = transformer.get_cached_features(cache_dir=cache_dir)
+    files = _cache_files(cache_dir)
+    assert len(files) == len(MODE_FAMILIES['all'])
+
+    capsys.readouterr()
+    second = transformer.get_cached_features(cache_dir=cache_dir)
+    assert capsys.readouterr().out.strip() == 'Loaded features from cache'
+    assert _cache_files(cache_dir) == files
+    assert second.equals(first)
+
+def test_cached_features_shared_by_loaded_and_fresh_instances(dataset, tmp_path, capsys):
+    cache_dir = str(tmp_path / 'cache')
+    loaded = DataTransformer(dataset)
+    loaded.load_data()
+    loaded.get_cached_features(cache_dir=cache_dir)
+
+    capsys.readouterr()
+    DataTransformer(dataset).get_cached_features(cache_dir=cache_dir)
+    assert capsys.readouterr().out.strip() == 'Loaded features from cache'
+    assert len(_cache_files(cache_dir)) == len(MODE_FAMILIES['all'])
@@ -0,0 +1,15 @@
+import pandas as pd
+from DataTransform import DataTransformer
+from benchmarks.synthetic import generate_ais
+
+
+def test_parallel_extraction_with_lambda_hooks():
+    transformer = DataTransformer('synthetic.csv')
+    transformer.data = generate_ais(n_ships=8, pings_per_ship=30, seed=2)
+    stages = []
+    parallel = transformer.extract_features(n_workers=2, hooks=[lambda record: stages.append(record)])
+    assert stages
+    #the report of the previous call (with its hooks) must not reach the workers either
+    again = transformer.extract_features(n_workers=2)
+    pd.testing.assert_frame_equal(parallel, again)
+    pd.testing.assert_frame_equal(parallel, transformer.extract_features())
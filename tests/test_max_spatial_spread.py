@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+from features import max_spatial_spread
+from features.max_spatial_spread import compute_max_spatial_spread
+from features.feature_state import FeatureState
+from utils.geo_utils import distance_km
+
+
+def _brute_force(lat, lon):
+    i, j = np.triu_indices(len(lat), 1)
+    return (distance_km(lat[i], lon[i], lat[j], lon[j], method='haversine') * 1000).max()
+
+def _track(lat, lon, shipid=1):
+    return pd.DataFrame({'shipid': shipid, 't': pd.date_range('2024-01-01', periods=len(lat), freq='h'),
+                         'lat': lat, 'lon': lon})
+
+def test_track_wider_than_a_hemisphere():
+    #around the world along the equator and up to the arctic: no point is the center of a hemisphere holding all of them
+    lon = np.r_[np.linspace(-179, 179, 40), np.full(10, 10.0)]
+    lat = np.r_[np.zeros(40), np.linspace(0, 85, 10)]
+    spread = compute_max_spatial_spread(_track(lat, lon), 'shipid', 't', 'lat', 'lon')['max_spatial_spread'][0]
+    np.testing.assert_allclose(spread, _brute_force(lat, lon), rtol=1e-12)
+
+def test_wide_tracks_match_brute_force():
+    rng = np.random.default_rng(0)
+    tracks, expected = [], []
+    for shipid in range(300):
+        n, span = rng.integers(2, 40), rng.choice([1, 20, 60, 100, 150, 180])
+        lat = np.clip(rng.uniform(-60, 60) + rng.uniform(-span / 2, span / 2, n), -90, 90)
+        lon = (rng.uniform(-180, 180) + rng.uniform(-span, span, n) + 180) % 360 - 180
+        tracks.append(_track(lat, lon, shipid))
+        expected.append(_brute_force(lat, lon))
+    spread = compute_max_spatial_spread(pd.concat(tracks), 'shipid', 't', 'lat', 'lon')
+    np.testing.assert_allclose(spread['max_spatial_spread'], expected, rtol=1e-12)
+
+def test_streamed_spread_of_a_wide_track():
+    lon = np.linspace(-179, 179, 60)
+    lat = 60 * np.sin(np.linspace(0, 6, 60))
+    data = _track(lat, lon).assign(speed=10.0, heading=90.0)
+    state = FeatureState('shipid', 't', 'speed', 'heading', 'lat', 'lon')
+    for start in range(0, len(data), 10):
+        state.update(data.iloc[start:start + 10])
+    np.testing.assert_allclose(state.to_features()['max_spatial_spread'][0], _brute_force(lat, lon), rtol=1e-12)
+
+def test_exact_search_in_small_blocks(monkeypatch):
+    monkeypatch.setattr(max_spatial_spread, 'BLOCK_BYTES', 8 * 100)
+    rng = np.random.default_rng(1)
+    lat, lon = rng.uniform(-80, 80, 2000), rng.uniform(-180, 180, 2000)
+    spread = compute_max_spatial_spread(_track(lat, lon), 'shipid', 't', 'lat', 'lon')['max_spatial_spread'][0]
+    np.testing.assert_allclose(spread, _brute_force(lat, lon), rtol=1e-12)
+
+def test_streamed_state_of_a_long_wide_track_is_bounded():
+    n = 20000
+    lon = np.linspace(-179, 179, n)
+    lat = 50 * np.sin(np.linspace(0, 12, n))
+    data = _track(lat, lon).assign(speed=10.0, heading=90.0)
+    state = FeatureState('shipid', 't', 'speed', 'heading', 'lat', 'lon')
+    for start in range(0, n, 2000):
+        state.update(data.iloc[start:start + 2000])
+    assert len(state.hulls[1][0]) <= max_spatial_spread.N_DIRECTIONS + 2
+    expected = compute_max_spatial_spread(data, 'shipid', 't', 'lat', 'lon')['max_spatial_spread'][0]
+    np.testing.assert_allclose(state.to_features()['max_spatial_spread'][0], expected, rtol=1e-3)
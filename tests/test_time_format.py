@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from DataTransform import DataTransformer
+from benchmarks.synthetic import generate_ais
+
+DAY_FIRST = '%d/%m/%Y %H:%M:%S'
+
+
+@pytest.fixture
+def day_first(tmp_path):
+    #days 12 and 13: a month-first guess swaps day and month or fails
+    data = generate_ais(n_ships=4, pings_per_ship=60, interval=1800, seed=1, start='2024-01-12')
+    path = tmp_path / 'ais.csv'
+    data.assign(t=data['t'].dt.strftime(DAY_FIRST)).to_csv(path, index=False)
+    reference = DataTransformer(str(path), time_format=DAY_FIRST)
+    reference.load_data()
+    features = reference.get_all_features()
+    assert (features['start_time'].to_numpy() == data.groupby('shipid')['t'].min().to_numpy()).all()
+    return str(path), data, features
+
+def _assert_same(features, reference):
+    columns = [col for col in reference.columns if 'curvature' not in col]
+    features = features[columns].reset_index(drop=True)
+    reference = reference[columns].reset_index(drop=True)
+    assert (features['start_time'] == reference['start_time']).all()
+    assert (features['end_time'] == reference['end_time']).all()
+    numeric = [col for col in columns if reference[col].dtype.kind in 'fi']
+    np.testing.assert_allclose(features[numeric].astype(float), reference[numeric].astype(float), rtol=1e-9)
+
+def test_stream_features_day_first(day_first):
+    path, _, reference = day_first
+    features = DataTransformer(path, time_format=DAY_FIRST).stream_features(chunksize=5)
+    _assert_same(features, reference)
+
+def test_update_day_first_without_data(day_first):
+    path, data, reference = day_first
+    raw = pd.read_csv(path)
+    transformer = DataTransformer(path, time_format=DAY_FIRST)
+    for rows in np.array_split(np.argsort(data['t'].to_numpy(), kind='stable'), 7):
+        features = transformer.update(raw.iloc[rows])
+    _assert_same(features, reference)
+
+def test_update_day_first_with_data(day_first):
+    path, data, reference = day_first
+    raw = pd.read_csv(path)
+    order = np.argsort(data['t'].to_numpy(), kind='stable')
+    head, *rest = np.array_split(order, 4)
+    transformer = DataTransformer(path, time_format=DAY_FIRST)
+    transformer.data = raw.iloc[head].reset_index(drop=True)
+    for rows in rest:
+        features = transformer.update(raw.iloc[rows])
+    _assert_same(features, reference)
+    np.testing.assert_allclose(features['max_curvature'], reference['max_curvature'], rtol=1e-9)
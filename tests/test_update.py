@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+from DataTransform import DataTransformer, COMPACT_RTOL
+from benchmarks.synthetic import generate_ais
+
+
+@pytest.fixture
+def data():
+    return generate_ais(n_ships=6, pings_per_ship=50, seed=3)
+
+def _reference(data):
+    transformer = DataTransformer('synthetic.csv')
+    transformer.data = data.copy()
+    return transformer.get_all_features()
+
+def _assert_same(features, reference, compact=False):
+    assert list(features.columns) == list(reference.columns)
+    assert (features['shipid'].to_numpy() == reference['shipid'].to_numpy()).all()
+    numeric = [col for col in reference.columns if reference[col].dtype.kind in 'fi']
+    actual, expected = features[numeric].to_numpy(dtype=float), reference[numeric].to_numpy(dtype=float)
+    #compact speed/heading are float32: within COMPACT_RTOL of the largest value of the column
+    scale = np.nanmax(np.abs(np.nan_to_num(expected)), axis=0) if compact else 0
+    close = np.isclose(actual, expected, rtol=1e-9, atol=0, equal_nan=True) | (np.abs(actual - expected) <= COMPACT_RTOL * scale)
+    assert close.all(), f'{[col for col, ok in zip(numeric, close.all(axis=0)) if not ok]} differ'
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_update_with_data_matches_full_extraction(data, compact, tmp_path):
+    head, *rest = np.array_split(np.arange(len(data)), 5)
+    path = tmp_path / 'head.parquet'
+    data.iloc[head].to_parquet(path)
+    transformer = DataTransformer(str(path), compact=compact)
+    transformer.load_data()
+    for rows in rest:
+        features = transformer.update(data.iloc[rows])
+    _assert_same(features, _reference(data), compact)
+    #the appended rows are all in data, in arrival order
+    assert len(transformer.data) == len(data)
+    assert (transformer.data['lat'].to_numpy() == data['lat'].to_numpy()).all()
+    if compact:
+        assert isinstance(transformer.data['shiptype'].dtype, pd.CategoricalDtype)
+
+def test_update_with_late_pings(data):
+    #a block of older pings arrives after newer ones of the same ships
+    order = np.r_[np.arange(100, len(data)), np.arange(100)]
+    transformer = DataTransformer('synthetic.csv')
+    transformer.data = data.iloc[order[:150]].reset_index(drop=True)
+    transformer.update(data.iloc[order[150:250]])
+    features = transformer.update(data.iloc[order[250:]])
+    _assert_same(features, _reference(data))
+
+def test_update_with_late_pings_without_data(data):
+    transformer = DataTransformer('synthetic.csv')
+    transformer.update(data.iloc[100:])
+    with pytest.raises(ValueError):
+        transformer.update(data.iloc[:100])
@@ -1,11 +1,11 @@
 import pandas as pd
 import datetime as dt
-from sklearn.impute import SimpleImputer
-from sklearn.metrics import pairwise_distances as pwd
-from scipy.spatial import ConvexHull, QhullError
 import numpy as np
 from geopy.distance import geodesic
 from scipy.interpolate import CubicSpline
+from features.distance_and_straightness import _compute_total_and_straightness_metrics as compute_total_and_straightness_metrics
+from features.max_spatial_spread import compute_max_spatial_spread, calculate_max_spread_per_group
+from utils.Imputer import transform_dataset as impute_dataset
 '''
 features for extraction:
 1) ROT: mean value , std
@@ -54,13 +54,7 @@ class DataTransformer:
         print("Numeric columns to impute:", numeric_col)
         print("Categorical columns to impute: ",cat_col)
         
-        numericImputer = SimpleImputer(strategy='mean')
-        categoricalImputer = SimpleImputer(strategy='most_frequent')
-
-        if numeric_col:
-             self.data[numeric_col] = numericImputer.fit_transform(self.data[numeric_col])
-        if cat_col:
-             self.data[cat_col] = categoricalImputer.fit_transform(self.data[cat_col])
+        self.data = impute_dataset(self.data,numeric_col,cat_col)
 
     def exist_null(self):
          exist_null = []
@@ -145,74 +139,20 @@ class DataTransformer:
          ).reset_index()
 
    #Total Distance and Tortuosity and Straightness_Ratio
-    def _compute_total_and_straightness_metrics(self):
-        required_cols = [self.id_col, self.time_col, self.lat_col, self.lon_col]
-        if not all(col in self.data.columns for col in required_cols):
-            raise ValueError("Missing one or more required columns in the dataset.")
-
-        new_df = self.data.sort_values(by=[self.id_col, self.time_col])
-
-        result = new_df.groupby(self.id_col).apply(
-            lambda group: self._compute_metrics(group)
-        ).reset_index()
-
-        return result[[self.id_col, 'total_distance_km', 'straightness_ratio', 'tortuosity']]
+    def _compute_total_and_straightness_metrics(self,method='haversine'):
+        return compute_total_and_straightness_metrics(self.data,self.id_col,self.time_col,
+                                                      self.lat_col,self.lon_col,method=method)
 
-    def _compute_metrics(self, group):
-        coords = list(zip(group[self.lat_col], group[self.lon_col]))
-        total_distance = sum(
-            geodesic(coords[i], coords[i + 1]).kilometers
-            for i in range(len(coords) - 1)
-        ) if len(coords) >= 2 else 0.0
-
-        if len(coords) < 2:
-            straightness, tortuosity = 0.0, 0.0
-        else:
-            direct_distance = geodesic(coords[0], coords[-1]).kilometers
-            straightness = 0 if total_distance == 0 else direct_distance / total_distance
-            tortuosity = 0 if direct_distance == 0 else total_distance / direct_distance
-
-        return pd.Series({
-            'total_distance_km': total_distance,
-            'straightness_ratio': straightness,
-            'tortuosity': tortuosity
-        })
     #Haversine formula from geopy
     def haversine(self,x,y):
           return geodesic(x,y).meters
    
-    def compute_max_spatial_spread(self):
-         required_cols = [self.id_col,self.time_col,self.lat_col,self.lon_col]
-         if not all(col in self.data.columns for col in required_cols):
-              raise ValueError("Missing one or more required columns")
-         
-         new_df = self.data.sort_values(by=[self.id_col,self.time_col])
-         result = new_df.groupby(self.id_col).apply(
-          lambda group: self.calculate_max_spread_per_group(group)
-         ).reset_index()
-         return result[[self.id_col,'max_spatial_spread']]
+    def compute_max_spatial_spread(self,method='haversine'):
+         return compute_max_spatial_spread(self.data,self.id_col,self.time_col,
+                                           self.lat_col,self.lon_col,method=method)
 
     def calculate_max_spread_per_group(self,df):
-      x = df[['lat','lon']].values
-
-      #Not enought points for ConvexHull algorithm
-      if len(x) < 3:
-         max_spread= 0.0 
-      else:
-         try:
-             hull = ConvexHull(x)
-             hull_points = x[hull.vertices]
-             distance_matrix = pwd(hull_points,hull_points,metric=self.haversine)
-             max_spread= distance_matrix.max()
-         except QhullError:
-             max_spread= 0.0 #ConvexHull failed     
-          
-      return pd.Series({
-        'max_spatial_spread':max_spread
-      })
-    
-
-
+         return calculate_max_spread_per_group(df,self.lat_col,self.lon_col)
 
     def curvature_results(self):
       required_columns = [self.id_col,self.lat_col,self.lon_col]
@@ -328,25 +268,23 @@ class DataTransformer:
 #examples below if you want to test it remove the ""
 
 
-data_transform = DataTransformer(
-        dataset_path='ais.csv',
-        time_col='t',
-        id_col='shipid',
-        speed_col='speed',
-        heading_col='heading',
-        lat_col='lat',
-        lon_col='lon',
-        course_col='course',
-        shiptype_col='shiptype',
-        destination_col='destination',
-        numeric_columns=['heading', 'course', 'speed'],
-        categorical_columns=['shiptype', 'destination']
-    )
-
-data_transform.load_data()
-data_transform.transform_dataset()
-features_df = data_transform.get_all_features()
-print(features_df)
-
-
-
+if __name__ == "__main__":
+    data_transform = DataTransformer(
+            dataset_path='ais.csv',
+            time_col='t',
+            id_col='shipid',
+            speed_col='speed',
+            heading_col='heading',
+            lat_col='lat',
+            lon_col='lon',
+            course_col='course',
+            shiptype_col='shiptype',
+            destination_col='destination',
+            numeric_columns=['heading', 'course', 'speed'],
+            categorical_columns=['shiptype', 'destination']
+        )
+
+    data_transform.load_data()
+    data_transform.transform_dataset()
+    features_df = data_transform.get_all_features()
+    print(features_df)
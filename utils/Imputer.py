@@ -1,12 +1,112 @@
-from sklearn.impute import SimpleImputer
+import numpy as np
 import pandas as pd
+from utils.time_utils import parse_time, is_normalized
 
+IMPUTE_METHODS = ('global', 'group', 'ffill')
 
-def transform_dataset(data,numeric_columns,categoriclal_columns):
-    if numeric_columns != None:
-        numerical_imputer = SimpleImputer(strategy='mean')
-        data[numeric_columns] = numerical_imputer.fit_transform(data[numeric_columns])
-    if categoriclal_columns != None:
-        categoriclal_imputer = SimpleImputer(strategy='most_frequent')
-        data[categoriclal_columns] = categoriclal_imputer.fit_transform(data[categoriclal_columns])
+
+def transform_dataset(data,numeric_columns,categoriclal_columns,method='global',group_col=None,time_col=None):
+    """
+    Fills the nulls of the given columns, in place (data is returned too).
+    Numeric columns get the mean, categorical columns the most frequent value
+    (the smallest one on ties), like SimpleImputer(strategy='mean'/'most_frequent').
+    Columns without nulls are not touched, and a column that is all null stays null.
+    method: 'global' | 'group' | 'ffill'
+        group: mean / most frequent value of the same group_col (e.g. ship)
+        ffill: last value of the same group_col before it in time_col order
+        what is still null after group/ffill gets the global value
+    """
+    if method not in IMPUTE_METHODS:
+        raise ValueError(f"Invalid method. Choose from: {IMPUTE_METHODS}")
+    if method != 'global' and group_col is None:
+        raise ValueError(f"method='{method}' needs group_col")
+    if method == 'ffill' and time_col is None:
+        raise ValueError("method='ffill' needs time_col")
+
+    columns = [(col, True) for col in numeric_columns or []] + [(col, False) for col in categoriclal_columns or []]
+    columns = [(col, numeric) for col, numeric in columns if data[col].isna().any()]
+    if not columns:
+        return data
+
+    groups = None
+    if method != 'global':
+        groups = pd.factorize(data[group_col])[0]
+    order = None
+    if method == 'ffill':
+        times = data[time_col] if is_normalized(data,time_col) else parse_time(data[time_col])
+        order = np.lexsort((times.to_numpy(dtype='datetime64[ns]').view('i8'), groups))
+
+    for col, numeric in columns:
+        if numeric:
+            _fill_numeric(data,col,method,groups,order)
+        else:
+            _fill_categorical(data,col,method,groups,order)
     return data
+
+def _fill_numeric(data,col,method,groups,order):
+    values = data[col].to_numpy(dtype=float)
+    missing = np.isnan(values)
+    fill = np.full(len(values), np.nanmean(values) if (~missing).any() else np.nan)
+    if method == 'group':
+        known = (groups >= 0) & ~missing
+        n_groups = groups.max() + 1 if len(groups) else 0
+        counts = np.bincount(groups[known], minlength=n_groups + 1)
+        sums = np.bincount(groups[known], weights=values[known], minlength=n_groups + 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            group_mean = (sums / counts)[groups]
+        #rows without group index the extra slot (count 0, NaN)
+        fill = np.where(np.isnan(group_mean), fill, group_mean)
+    elif method == 'ffill':
+        previous = _ffill(values, missing, groups, order)
+        fill = np.where(np.isnan(previous), fill, previous)
+    fill = fill[missing]
+    if data[col].dtype.kind == 'f':
+        #float32 columns (compact mode) stay float32
+        fill = fill.astype(data[col].dtype)
+    data.loc[missing, col] = fill
+
+def _fill_categorical(data,col,method,groups,order):
+    series = data[col]
+    #sorted codes: argmax of the counts is the smallest of the most frequent values
+    codes, uniques = pd.factorize(series, sort=True)
+    missing = codes < 0
+    if missing.all():
+        return
+    fill = np.full(len(codes), np.bincount(codes[~missing]).argmax())
+    if method == 'group':
+        modes = _group_modes(codes, groups, len(uniques))
+        fill = np.where(modes < 0, fill, modes)
+    elif method == 'ffill':
+        previous = _ffill(codes.astype(float), missing, groups, order)
+        fill = np.where(np.isnan(previous), fill, np.nan_to_num(previous)).astype(np.int64)
+    values = np.asarray(uniques)[fill[missing]]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = pd.Categorical(values, categories=series.cat.categories)
+    data.loc[missing, col] = values
+
+#last non null value of the same group before every row, in order (NaN if there is none)
+def _ffill(values, missing, groups, order):
+    n = len(values)
+    values, missing, groups = values[order], missing[order], groups[order]
+    group_start = np.r_[0, np.flatnonzero(groups[1:] != groups[:-1]) + 1]
+    start = np.repeat(group_start, np.diff(np.r_[group_start, n]))
+    #a row index never goes back to the previous group: start - 1 is above all of them
+    last = np.maximum.accumulate(np.where(missing, start - 1, np.arange(n)))
+    filled = np.where(last >= start, values[np.maximum(last, 0)], np.nan)
+    filled[groups < 0] = np.nan
+    result = np.empty(n)
+    result[order] = filled
+    return result
+
+#most frequent code (smallest on ties) of every group, for every row; -1 for groups with only nulls
+def _group_modes(codes, groups, n_codes):
+    valid = (codes >= 0) & (groups >= 0)
+    pairs, counts = np.unique(groups[valid].astype(np.int64) * n_codes + codes[valid], return_counts=True)
+    pair_group, pair_code = pairs // n_codes, pairs % n_codes
+    #per group: highest count first, then smallest code
+    best = np.lexsort((pair_code, -counts, pair_group))
+    first = best[np.r_[True, pair_group[best][1:] != pair_group[best][:-1]]]
+    #one extra slot for the rows without group (index -1)
+    modes = np.full(groups.max() + 2, -1, dtype=np.int64)
+    modes[pair_group[first]] = pair_code[first]
+    return modes[groups]
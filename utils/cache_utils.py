@@ -1,19 +1,103 @@
-import os 
-import pickle 
+import os
+import json
+import pickle
+import hashlib
+import pandas as pd
 
 """
-for saving the results and loading them to save time 
+for saving the results and loading them to save time
 in the calculation
 """
 
 def save_cache(data,filepath):
-    os.makedirs(os.path.dirname(filepath),exist_ok=True)
+    os.makedirs(os.path.dirname(filepath) or '.',exist_ok=True)
     with open(filepath,'wb') as f:
         pickle.dump(data,f)
-    
+
 
 def load_cache(filepath):
     if os.path.exists(filepath):
-        with open(filepath,'th') as f:
-            return pickle.load()
+        with open(filepath,'rb') as f:
+            return pickle.load(f)
     return None
+
+#Identity of an input file: size and modification time, plus a sha256 of the content if asked
+def file_fingerprint(filepath,content_hash=False,block_size=1 << 20):
+    stat = os.stat(filepath)
+    fingerprint = {'path': os.path.abspath(filepath), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if content_hash:
+        digest = hashlib.sha256()
+        with open(filepath,'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+        fingerprint['sha256'] = digest.hexdigest()
+    return fingerprint
+
+#Stable key of any json-like description (file fingerprint, columns, feature, parameters)
+def cache_key(*parts):
+    text = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+class FeatureCache:
+    """
+    Directory of DataFrames addressed by cache_key(), one file per key.
+    Parquet when pyarrow is installed (pickle otherwise, or for frames Parquet can't store).
+    Reads refresh the modification time of the file, and after every write the least
+    recently used files are removed until the directory is at most max_bytes.
+    """
+    def __init__(self,cache_dir='cache/features',max_bytes=512 * 1024**2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self,key,ext):
+        return os.path.join(self.cache_dir, key + ext)
+
+    def get(self,key):
+        for ext, read in (('.parquet', pd.read_parquet), ('.pkl', pd.read_pickle)):
+            path = self._path(key,ext)
+            if os.path.exists(path):
+                try:
+                    data = read(path)
+                except Exception:
+                    #unreadable (partial write, missing pyarrow): treat as a miss
+                    return None
+                os.utime(path)
+                return data
+        return None
+
+    def put(self,key,data):
+        os.makedirs(self.cache_dir,exist_ok=True)
+        path = self._path(key,'.pkl')
+        try:
+            data.to_parquet(self._path(key,'.parquet') + '.tmp',index=False)
+            path = self._path(key,'.parquet')
+        except Exception:
+            if os.path.exists(self._path(key,'.parquet') + '.tmp'):
+                os.remove(self._path(key,'.parquet') + '.tmp')
+            data.to_pickle(path + '.tmp')
+        #write then rename, a reader never sees half a file
+        os.replace(path + '.tmp', path)
+        self.evict(keep=path)
+
+    def evict(self,keep=None):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir,name)
+            if name.endswith('.tmp') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir,name))
@@ -1,7 +1,86 @@
+import os
 import pandas as pd
+from utils.time_utils import normalize_time
+
+CSV_EXTENSIONS = ('.csv',)
+PARQUET_EXTENSIONS = ('.parquet','.pq')
+FEATHER_EXTENSIONS = ('.feather','.arrow','.ipc')
 
 def load_csv(dataset_path):
     if dataset_path.endswith('.csv'):
         return pd.read_csv(dataset_path)
     else:
-        raise ValueError("Only CSV Files allowed in this version")
\ No newline at end of file
+        raise ValueError("Only CSV Files allowed in this version")
+
+def load_dataset(dataset_path,columns=None,time_col=None,downcast=False,keep_float64=(),time_format=None):
+    """
+    Loads a CSV, Parquet or Feather/Arrow IPC file.
+    columns: read only these columns (the ones that exist in the file)
+    time_col: parsed to datetime once (normalize_time), time_format as in parse_time
+    downcast: float64 -> float32 (except the keep_float64 columns, e.g. lat/lon)
+              and strings -> categorical
+    """
+    ext = os.path.splitext(dataset_path)[1].lower()
+    if ext in CSV_EXTENSIONS:
+        usecols = None if columns is None else (lambda col: col in columns)
+        data = pd.read_csv(dataset_path,usecols=usecols)
+    elif ext in PARQUET_EXTENSIONS + FEATHER_EXTENSIONS:
+        names = _arrow_column_names(dataset_path,ext)
+        selected = None if columns is None else [col for col in names if col in columns]
+        if ext in PARQUET_EXTENSIONS:
+            data = pd.read_parquet(dataset_path,columns=selected)
+        else:
+            data = pd.read_feather(dataset_path,columns=selected)
+    else:
+        raise ValueError(f"Unsupported file type {ext}. Use one of: {CSV_EXTENSIONS + PARQUET_EXTENSIONS + FEATHER_EXTENSIONS}")
+
+    if time_col is not None and time_col in data.columns:
+        normalize_time(data,time_col,time_format)
+    if downcast:
+        data = downcast_dataframe(data,exclude=(time_col,),keep_float64=keep_float64)
+    return data
+
+#Reads the csv in chunks of chunksize rows, only the given columns (the ones that exist)
+def load_csv_chunks(dataset_path,chunksize,columns=None):
+    if not dataset_path.endswith('.csv'):
+        raise ValueError("Only CSV Files allowed in this version")
+    usecols = None if columns is None else (lambda col: col in columns)
+    return pd.read_csv(dataset_path,chunksize=chunksize,usecols=usecols)
+
+def downcast_dataframe(data,exclude=(),keep_float64=()):
+    for col in data.columns:
+        if col in exclude or isinstance(data[col].dtype, pd.CategoricalDtype):
+            continue
+        dtype = data[col].dtype
+        if dtype == 'float64' and col not in keep_float64:
+            data[col] = data[col].astype('float32')
+        elif dtype == object or pd.api.types.is_string_dtype(dtype):
+            data[col] = data[col].astype('category')
+    return data
+
+def compact_dataframe(data,float32=(),exclude=()):
+    """
+    Compact memory layout, in place: strings (ids, shiptype, destination, ...) become categoricals
+    (int codes + one copy of every distinct value) and only the float32 columns are downcast,
+    everything else (e.g. lat/lon) keeps its precision
+    """
+    for col in data.columns:
+        if col in exclude or isinstance(data[col].dtype, pd.CategoricalDtype):
+            continue
+        dtype = data[col].dtype
+        if col in float32 and dtype.kind == 'f' and dtype != 'float32':
+            data[col] = data[col].astype('float32')
+        elif dtype == object or pd.api.types.is_string_dtype(dtype):
+            data[col] = data[col].astype('category')
+    return data
+
+def _arrow_column_names(dataset_path,ext):
+    try:
+        import pyarrow.parquet as pq
+        import pyarrow.ipc as ipc
+    except ImportError:
+        raise ImportError("pyarrow is needed to read Parquet/Feather files: pip install pyarrow")
+    if ext in PARQUET_EXTENSIONS:
+        return pq.read_schema(dataset_path).names
+    with ipc.open_file(dataset_path) as reader:
+        return reader.schema.names
@@ -0,0 +1,79 @@
+import heapq
+import numpy as np
+
+"""
+Shape preserving downsampling to a point budget, before plotting/mapping long trajectories.
+Both functions return the sorted indices of the points to keep (first and last included),
+or all of them when there are no more than n_out.
+"""
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets for a time series (x increasing, e.g. int64 times).
+    The points between the first and the last are split in n_out - 2 buckets and from every
+    bucket the point that makes the largest triangle with the previous kept point and the
+    mean of the next bucket is kept.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    n_out = max(n_out, 3)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    for b in range(n_out - 2):
+        start, stop = edges[b], edges[b + 1]
+        if b + 2 < len(edges):
+            next_x, next_y = x[stop:edges[b + 2]].mean(), y[stop:edges[b + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        a = keep[b]
+        area = np.abs((x[a] - next_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (next_y - y[a]))
+        #NaN values are never picked unless the whole bucket is NaN
+        area = np.where(np.isnan(area), -1.0, area)
+        keep[b + 1] = start + np.argmax(area)
+    return keep
+
+def douglas_peucker(lat, lon, n_out):
+    """
+    Douglas-Peucker with a point budget for a polyline: starting from the first and last
+    point, the point furthest from its simplified segment is added until n_out points are
+    kept (a heap of segments ordered by their furthest point).
+    Distances are planar on lon scaled by cos(mean lat).
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    n = len(lat)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    n_out = max(n_out, 2)
+    y = lat
+    x = lon * np.cos(np.radians(np.nanmean(lat)))
+
+    heap = []
+    _push_segment(heap, x, y, 0, n - 1)
+    keep = [0, n - 1]
+    while heap and len(keep) < n_out:
+        _, i, j, k = heapq.heappop(heap)
+        keep.append(k)
+        _push_segment(heap, x, y, i, k)
+        _push_segment(heap, x, y, k, j)
+    return np.sort(np.asarray(keep, dtype=np.int64))
+
+#furthest point of the segment i..j from the line between i and j, pushed as (-distance, i, j, k)
+def _push_segment(heap, x, y, i, j):
+    if j - i < 2:
+        return
+    dx, dy = x[j] - x[i], y[j] - y[i]
+    px, py = x[i + 1:j] - x[i], y[i + 1:j] - y[i]
+    norm = np.hypot(dx, dy)
+    if norm == 0:
+        distance = np.hypot(px, py)
+    else:
+        distance = np.abs(dx * py - dy * px) / norm
+    distance = np.nan_to_num(distance, nan=-1.0)
+    k = int(np.argmax(distance))
+    heapq.heappush(heap, (-distance[k], i, j, i + 1 + k))
@@ -0,0 +1,103 @@
+import numpy as np
+
+"""
+Vectorized distance kernels that work on whole coordinate arrays at once
+instead of calling geopy for every pair of points.
+All distances are returned in kilometers.
+"""
+
+EARTH_RADIUS_KM = 6371.0088
+
+#WGS-84 ellipsoid (same one geopy uses for geodesic)
+WGS84_A_KM = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B_KM = WGS84_A_KM * (1 - WGS84_F)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance on a sphere with the mean earth radius.
+    Inputs are degrees and can be scalars or arrays that broadcast together.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def vincenty_km(lat1, lon1, lat2, lon2, max_iter=200, tol=1e-12):
+    """
+    Ellipsoidal (WGS-84) distance with Vincenty's inverse formula, iterated on
+    the whole array at once. Pairs that fail to converge (nearly antipodal points)
+    fall back to the haversine distance.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (lat1, lon1, lat2, lon2)))
+    f = WGS84_F
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt((cosU2 * sin_lam) ** 2 + (cosU1 * sinU2 - sinU1 * cosU2 * cos_lam) ** 2)
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            #equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            converged = np.abs(lam - lam_prev) < tol
+            if converged.all():
+                break
+
+        u2 = cos2_alpha * (WGS84_A_KM ** 2 - WGS84_B_KM ** 2) / WGS84_B_KM ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+        distance = WGS84_B_KM * A * (sigma - delta_sigma)
+
+    distance = np.where(sin_sigma == 0, 0.0, distance)
+    bad = ~converged | ~np.isfinite(distance)
+    if bad.any():
+        distance = np.where(bad, haversine_km(lat1, lon1, lat2, lon2), distance)
+    return distance
+
+
+DISTANCE_METHODS = {
+    'haversine': haversine_km,
+    'vincenty': vincenty_km,
+}
+
+
+def distance_km(lat1, lon1, lat2, lon2, method='haversine'):
+    if method not in DISTANCE_METHODS:
+        raise ValueError(f"Invalid method. Choose from: {list(DISTANCE_METHODS)}")
+    return DISTANCE_METHODS[method](lat1, lon1, lat2, lon2)
+
+
+def segment_distances_km(lat, lon, starts=None, method='haversine'):
+    """
+    Distance between every ping and the previous one, for a whole sorted frame.
+    Returns an array with the same length as lat/lon; position i holds the
+    distance from ping i-1 to ping i and is 0 for the first ping of every group
+    (starts are the row offsets where a new group begins).
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    seg = np.zeros(len(lat), dtype=float)
+    if len(lat) > 1:
+        seg[1:] = distance_km(lat[:-1], lon[:-1], lat[1:], lon[1:], method=method)
+    if starts is not None and len(starts):
+        seg[np.asarray(starts)] = 0.0
+    return seg
@@ -0,0 +1,57 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+import pandas as pd
+
+"""
+Timing and memory of the stages of a feature extraction. Every stage gives one record:
+name, wall_s, cpu_s, peak_memory_mb (peak traced allocation above what was allocated
+when the stage started), rows and groups. The records are kept in the report and passed
+to every hook as soon as the stage ends, e.g. to forward them to a metrics system.
+"""
+
+class ExtractionReport:
+    """
+    hooks: callables taking one record (dict)
+    memory: trace allocations with tracemalloc (slows pure python code down a bit)
+    """
+    def __init__(self,hooks=(),memory=True):
+        self.hooks = list(hooks)
+        self.memory = memory
+        self.records = []
+
+    @contextmanager
+    def measure(self,name,rows=None,groups=None):
+        started_tracing = self.memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.memory:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record = {
+                'name': name,
+                'wall_s': time.perf_counter() - wall,
+                'cpu_s': time.process_time() - cpu,
+                'peak_memory_mb': (tracemalloc.get_traced_memory()[1] - base) / 1024**2 if self.memory else None,
+                'rows': rows,
+                'groups': groups
+            }
+            if started_tracing:
+                tracemalloc.stop()
+            self.records.append(record)
+            for hook in self.hooks:
+                hook(record)
+
+    @property
+    def total_wall_s(self):
+        return sum(record['wall_s'] for record in self.records)
+
+    def to_frame(self):
+        return pd.DataFrame(self.records,columns=['name','wall_s','cpu_s','peak_memory_mb','rows','groups'])
+
+    def __repr__(self):
+        return f"ExtractionReport({len(self.records)} stages, {self.total_wall_s:.3f}s)\n{self.to_frame().to_string(index=False)}"
@@ -0,0 +1,87 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from utils.trajectory_frame import TrajectoryFrame
+
+"""
+Runs a feature function on shards of a TrajectoryFrame in a process pool.
+Ships are hash-partitioned into shards, the sorted column arrays are put once
+in shared memory and every worker gathers the rows of its own ships from there,
+so no DataFrame is pickled to the workers. Only the (small) per-ship results come back.
+"""
+
+SHARDS_PER_WORKER = 4
+
+
+def partition_groups(ids,n_shards):
+    #stable across runs and processes, unlike hash()
+    shard = pd.util.hash_array(np.asarray(ids, dtype=object)) % np.uint64(n_shards)
+    return [np.flatnonzero(shard == i) for i in range(n_shards)]
+
+def run_partitioned(frame,func,n_workers):
+    """
+    func: picklable callable taking a TrajectoryFrame and returning a DataFrame with
+    one row per id (frame.id_col column). Results are concatenated in id order,
+    the same order a single process run returns.
+    """
+    shards = [groups for groups in partition_groups(frame.ids, n_workers * SHARDS_PER_WORKER) if len(groups)]
+    if not shards:
+        return func(frame)
+
+    buffers, specs = [], {}
+    try:
+        for col, values in frame.arrays.items():
+            if values.dtype == object:
+                specs[col] = ('object', values)
+                continue
+            shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            buffers.append(shm)
+            np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+            specs[col] = ('shared', (shm.name, values.dtype.str, len(values)))
+
+        tasks = []
+        for groups in shards:
+            shard_specs = {
+                col: (kind, spec if kind == 'shared' else spec[_rows(frame.starts[groups], frame.ends[groups])])
+                for col, (kind, spec) in specs.items()
+            }
+            tasks.append((frame.id_col, frame.time_col, frame.ids[groups],
+                          frame.starts[groups], frame.ends[groups], shard_specs, func))
+
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(_run_shard, tasks))
+    finally:
+        for shm in buffers:
+            shm.close()
+            shm.unlink()
+
+    result = pd.concat(results, ignore_index=True)
+    order = np.argsort(pd.Index(frame.ids).get_indexer(result[frame.id_col]), kind='stable')
+    return result.iloc[order].reset_index(drop=True)
+
+#row indices of the given [start,end) ranges, concatenated
+def _rows(starts,ends):
+    lengths = ends - starts
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+def _run_shard(task):
+    id_col, time_col, ids, starts, ends, specs, func = task
+    rows = _rows(starts, ends)
+    lengths = ends - starts
+    offsets = np.r_[0, np.cumsum(lengths)].astype(np.int64)
+
+    arrays = {}
+    for col, (kind, spec) in specs.items():
+        if kind == 'object':
+            arrays[col] = spec
+            continue
+        name, dtype, length = spec
+        #workers share the parent's resource tracker, the parent unlinks the segment
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            arrays[col] = np.ndarray((length,), dtype=np.dtype(dtype), buffer=shm.buf)[rows]
+        finally:
+            shm.close()
+    return func(TrajectoryFrame(id_col, time_col, ids, offsets, arrays))
@@ -0,0 +1,69 @@
+import numpy as np
+
+"""
+Reductions over contiguous segments of a sorted array (np.ufunc.reduceat),
+used instead of groupby once the rows are sorted by id.
+starts are the row offsets where every segment begins, every segment is non empty.
+NaN values are skipped like pandas does.
+"""
+
+def segment_count(values,starts):
+    if len(starts) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.add.reduceat(~np.isnan(values), starts).astype(np.int64)
+
+def segment_sum(values,starts):
+    if len(starts) == 0:
+        return np.zeros(0)
+    return np.add.reduceat(np.where(np.isnan(values), 0.0, values), starts)
+
+def segment_max(values,starts):
+    if len(starts) == 0:
+        return np.zeros(0)
+    return np.fmax.reduceat(values, starts)
+
+def segment_min(values,starts):
+    if len(starts) == 0:
+        return np.zeros(0)
+    return np.fmin.reduceat(values, starts)
+
+def segment_stats(values,starts,ddof=1):
+    """
+    count, mean, m2 (sum of squared deviations), std, min and max of every segment in one go
+    """
+    values = np.asarray(values, dtype=float)
+    count = segment_count(values, starts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = segment_sum(values, starts) / count
+        lengths = np.diff(np.r_[starts, len(values)])
+        centered = np.where(np.isnan(values), 0.0, values - np.repeat(mean, lengths))
+        #not NaN-skipping on purpose: inf values make the std NaN, like pandas
+        m2 = np.add.reduceat(centered * centered, starts) if len(starts) else np.zeros(0)
+        std = np.where(count > ddof, np.sqrt(m2 / (count - ddof)), np.nan)
+    return {
+        'count': count,
+        'mean': mean,
+        'm2': m2,
+        'std': std,
+        'min': segment_min(values, starts),
+        'max': segment_max(values, starts),
+    }
+
+def merge_moments(n_a,mean_a,m2_a,n_b,mean_b,m2_b):
+    """
+    Chan et al. parallel update of (count, mean, m2) moments, elementwise.
+    Either side can be empty (count 0, mean NaN).
+    """
+    n = n_a + n_b
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = mean_b - mean_a
+        mean = np.where(n_b == 0, mean_a, np.where(n_a == 0, mean_b, mean_a + delta * n_b / n))
+        #inf means: combine the sums instead, inf + finite stays inf like a plain mean
+        infinite = (n_a > 0) & (n_b > 0) & ~(np.isfinite(mean_a) & np.isfinite(mean_b))
+        mean = np.where(infinite, (mean_a * n_a + mean_b * n_b) / n, mean)
+        m2 = np.where(n_b == 0, m2_a, np.where(n_a == 0, m2_b, m2_a + m2_b + delta * delta * n_a * n_b / n))
+    return n, mean, m2
+
+def moments_std(n,m2,ddof=1):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(n > ddof, np.sqrt(m2 / (n - ddof)), np.nan)
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+"""
+Uniform lat/lon grid over the pings of a TrajectoryFrame, to find the ships that passed
+through a bounding box or polygon (and time window) without scanning every ping.
+A posting is a run of consecutive pings of one ship in one cell: (cell, group, rows, first/last time).
+Postings are sorted by cell (CSR: cells + cell_offsets), a query looks up the cells it covers,
+drops the postings outside the time window and checks only the pings of the postings that
+are not entirely inside the query.
+"""
+
+
+class GridIndex:
+    def __init__(self,frame,lat_col,lon_col,cell_size,cells,cell_offsets,groups,row_starts,row_ends,t_starts,t_ends):
+        self.frame = frame
+        self.lat_col = lat_col
+        self.lon_col = lon_col
+        #cell side in degrees
+        self.cell_size = cell_size
+        self.n_cols = int(np.ceil(360 / cell_size))
+        #sorted ids of the cells with pings, postings of cells[i] are cell_offsets[i]:cell_offsets[i+1]
+        self.cells = cells
+        self.cell_offsets = cell_offsets
+        #per posting: group of the frame, rows row_starts:row_ends, int64 time of the first/last ping
+        self.groups = groups
+        self.row_starts = row_starts
+        self.row_ends = row_ends
+        self.t_starts = t_starts
+        self.t_ends = t_ends
+
+    @classmethod
+    def from_frame(cls,frame,lat_col,lon_col,cell_size=0.1):
+        """
+        frame: TrajectoryFrame (sorted by id, time), pings without lat/lon are not indexed
+        cell_size: degrees, 0.1 is ~11 km of latitude
+        """
+        for col in (lat_col,lon_col):
+            if col not in frame.arrays:
+                raise ValueError(f'{col} not in the dataset')
+        if cell_size <= 0:
+            raise ValueError('cell_size must be positive')
+        lat = np.asarray(frame[lat_col], dtype=float)
+        lon = np.asarray(frame[lon_col], dtype=float)
+        rows = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+        cell = _cell_of(lat[rows], lon[rows], cell_size)
+        group = frame.group_index[rows]
+
+        #a new posting where the cell or the ship changes or a ping was skipped
+        new = np.r_[True, (cell[1:] != cell[:-1]) | (group[1:] != group[:-1]) | (np.diff(rows) != 1)] if len(rows) else np.zeros(0, dtype=bool)
+        first = np.flatnonzero(new)
+        last = np.r_[first[1:] - 1, len(rows) - 1] if len(first) else first
+        order = np.argsort(cell[first], kind='stable')
+        first, last = first[order], last[order]
+
+        cells, counts = np.unique(cell[first], return_counts=True)
+        cell_offsets = np.r_[0, np.cumsum(counts)].astype(np.int64)
+        row_starts, row_ends = rows[first], rows[last] + 1
+        return cls(frame,lat_col,lon_col,cell_size,cells,cell_offsets,group[first],
+                   row_starts,row_ends,frame.times[row_starts],frame.times[row_ends - 1])
+
+    def query_bbox(self,min_lat,min_lon,max_lat,max_lon,start=None,end=None):
+        """
+        Groups (positions in the frame, sorted) with at least one ping inside the box
+        (edges included) and inside [start, end] when given (anything pd.Timestamp takes).
+        frame.ids[groups] are the ship ids and frame.select(groups) their pings.
+        """
+        if min_lat > max_lat or min_lon > max_lon:
+            raise ValueError('min_lat/min_lon must not be above max_lat/max_lon')
+        postings, cells = self._postings(min_lat,min_lon,max_lat,max_lon,start,end)
+        lat_low, lon_low = self._cell_corner(cells)
+        inside = ((lat_low >= min_lat) & (lat_low + self.cell_size <= max_lat)
+                  & (lon_low >= min_lon) & (lon_low + self.cell_size <= max_lon))
+        return self._match(postings,inside,start,end,
+                           lambda lat, lon: (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon))
+
+    def query_polygon(self,polygon,start=None,end=None):
+        """
+        polygon: sequence of (lat, lon) vertices (closed or not), same result as query_bbox
+        for the pings inside it
+        """
+        polygon = np.asarray(polygon, dtype=float)
+        if polygon.ndim != 2 or polygon.shape[1] != 2 or len(polygon) < 3:
+            raise ValueError('polygon must be at least 3 (lat, lon) vertices')
+        (min_lat, min_lon), (max_lat, max_lon) = polygon.min(axis=0), polygon.max(axis=0)
+        postings, _ = self._postings(min_lat,min_lon,max_lat,max_lon,start,end)
+        return self._match(postings,np.zeros(len(postings), dtype=bool),start,end,
+                           lambda lat, lon: _in_polygon(lat, lon, polygon))
+
+    def select(self,groups):
+        return self.frame.select(groups)
+
+    #lat/lon of the south west corner of every cell
+    def _cell_corner(self,cells):
+        return (cells // self.n_cols) * self.cell_size - 90, (cells % self.n_cols) * self.cell_size - 180
+
+    #postings (and their cells) of the cells that overlap the box and of the time window
+    def _postings(self,min_lat,min_lon,max_lat,max_lon,start,end):
+        low, high = _cell_of(np.array([min_lat, max_lat]), np.array([min_lon, max_lon]), self.cell_size)
+        rows = np.arange(low // self.n_cols, high // self.n_cols + 1)
+        cols = np.arange(low % self.n_cols, high % self.n_cols + 1)
+        if len(rows) * len(cols) <= len(self.cells):
+            wanted = (rows[:, None] * self.n_cols + cols).ravel()
+            found = np.searchsorted(self.cells, wanted)
+            found = found[(found < len(self.cells)) & (self.cells[np.minimum(found, len(self.cells) - 1)] == wanted)]
+        else:
+            #the box covers more cells than there are with pings: scan the cell list instead
+            found = np.flatnonzero(np.isin(self.cells // self.n_cols, rows) & np.isin(self.cells % self.n_cols, cols))
+        first, last = self.cell_offsets[found], self.cell_offsets[found + 1]
+        lengths = last - first
+        postings = np.repeat(first - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+        cells = np.repeat(self.cells[found], lengths)
+
+        start, end = _window(start, end)
+        keep = (self.t_ends[postings] >= start) & (self.t_starts[postings] <= end)
+        return postings[keep], cells[keep]
+
+    #groups of the postings accepted as a whole (cell inside the query and all pings in the window)
+    #and of the other postings that have a ping passing the check
+    def _match(self,postings,inside,start,end,check):
+        start, end = _window(start, end)
+        whole = inside & (self.t_starts[postings] >= start) & (self.t_ends[postings] <= end)
+        partial = postings[~whole]
+        lengths = self.row_ends[partial] - self.row_starts[partial]
+        rows = np.repeat(self.row_starts[partial] - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+        times = self.frame.times[rows]
+        hit = (check(np.asarray(self.frame[self.lat_col][rows], dtype=float), np.asarray(self.frame[self.lon_col][rows], dtype=float))
+               & (times >= start) & (times <= end))
+        return np.union1d(self.groups[postings[whole]], np.repeat(self.groups[partial], lengths)[hit])
+
+
+#row * n_cols + column of the cell of every point, rows from the south pole and columns from lon -180
+def _cell_of(lat,lon,cell_size):
+    n_cols = int(np.ceil(360 / cell_size))
+    row = np.clip(np.floor((lat + 90) / cell_size), 0, None).astype(np.int64)
+    col = np.clip(np.floor((lon + 180) / cell_size), 0, n_cols - 1).astype(np.int64)
+    return row * n_cols + col
+
+def _window(start,end):
+    #int64 nanoseconds, open ends as the int64 limits (naive times are UTC like the frame)
+    bounds = []
+    for value, default in ((start, np.iinfo(np.int64).min), (end, np.iinfo(np.int64).max)):
+        if value is None:
+            bounds.append(default)
+            continue
+        value = pd.Timestamp(value)
+        if value.tzinfo is not None:
+            value = value.tz_convert(None)
+        bounds.append(value.value)
+    return bounds
+
+#ray casting, points on the edges can go either way
+def _in_polygon(lat,lon,polygon):
+    inside = np.zeros(len(lat), dtype=bool)
+    y, x = polygon[:, 0], polygon[:, 1]
+    for i in range(len(polygon)):
+        y0, x0, y1, x1 = y[i - 1], x[i - 1], y[i], x[i]
+        crosses = (y0 > lat) != (y1 > lat)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_at = x0 + (lat - y0) * (x1 - x0) / (y1 - y0)
+        inside ^= crosses & (lon < x_at)
+    return inside
@@ -1,9 +1,91 @@
-import pandas as pd 
+import re
+import numpy as np
+import pandas as pd
 import datetime as dt
 
-def categorize_time(df,time_col):
+#df.attrs key set by normalize_time: the time column that's already parsed
+NORMALIZED_ATTR = 'time_normalized'
+TIME_FORMATS = ('datetime', 'iso', 'epoch_s', 'epoch_ms', 'epoch_us', 'epoch_ns')
+
+_ISO = re.compile(r'^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?(Z|[+-]\d{2}:?\d{2})?$')
+_NS = 3_600 * 10**9
+
+
+def categorize_time(df,time_col,time_format=None):
     if time_col not in df.columns:
         raise ValueError(f'{time_col} not in the dataset')
-    df[time_col] = pd.to_datetime(df[time_col])
-    df.loc[(df[time_col].dt.minute==59) & (df[time_col].dt.second==59),time_col] = df[time_col] + pd.Timedelta(seconds=1)
+    return normalize_time(df,time_col,time_format)
+
+def normalize_time(df,time_col,time_format=None):
+    """
+    Parses the time column once, in place: datetime64[ns] (int64 nanoseconds underneath)
+    with the 59:59 fix, and marks df so the next calls (and TrajectoryFrame) skip it.
+    time_format: one of TIME_FORMATS, a strptime format, or None to detect it
+    """
+    if is_normalized(df,time_col):
+        return df
+    df[time_col] = parse_time(df[time_col],time_format)
+    df.attrs[NORMALIZED_ATTR] = time_col
     return df
+
+def is_normalized(df,time_col):
+    return df.attrs.get(NORMALIZED_ATTR) == time_col and pd.api.types.is_datetime64_any_dtype(df[time_col])
+
+def detect_time_format(series,sample=1000):
+    """
+    'datetime' for datetime dtypes, 'epoch_s'/'epoch_ms'/'epoch_us'/'epoch_ns' for numbers
+    (by magnitude), 'iso' for ISO 8601 strings and None when it's something else
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    values = series.dropna()
+    if pd.api.types.is_numeric_dtype(series):
+        if values.empty:
+            return 'epoch_s'
+        #seconds since 1970 stay below 1e11 until the year 5138
+        magnitude = np.abs(values.to_numpy(dtype=float)).max()
+        for unit, limit in (('epoch_s', 1e11), ('epoch_ms', 1e14), ('epoch_us', 1e17)):
+            if magnitude < limit:
+                return unit
+        return 'epoch_ns'
+    head = values.iloc[:sample].astype(str)
+    if len(head) and head.str.match(_ISO).all():
+        return 'iso'
+    return None
+
+def _parse_iso(series,sample=1000):
+    #a 'Z' suffix sends pandas to its slow timezone path, parse the naive part and localize instead
+    head = series.dropna().iloc[:sample]
+    if len(head) and head.astype(str).str.endswith('Z').all():
+        try:
+            parsed = pd.to_datetime(series.str.removesuffix('Z'), format='ISO8601')
+            if parsed.dt.tz is None:
+                return parsed.dt.tz_localize('UTC')
+        except (ValueError, TypeError, AttributeError):
+            pass
+    return pd.to_datetime(series, format='ISO8601')
+
+def parse_time(series,time_format=None):
+    if time_format is None:
+        time_format = detect_time_format(series)
+    if time_format == 'datetime':
+        series = pd.to_datetime(series)
+    elif time_format in ('epoch_s', 'epoch_ms', 'epoch_us', 'epoch_ns'):
+        series = pd.to_datetime(series, unit=time_format[len('epoch_'):])
+    elif time_format == 'iso':
+        series = _parse_iso(series)
+    elif time_format is not None:
+        series = pd.to_datetime(series, format=time_format)
+    else:
+        series = pd.to_datetime(series)
+    # Fix rare edge case where timestamps end with 59:59 to avoid time bucketing conflicts
+    if getattr(series.dt, 'tz', None) is not None:
+        edge = (series.dt.minute==59) & (series.dt.second==59)
+        return series.mask(edge, series + pd.Timedelta(seconds=1))
+    series = series.astype('datetime64[ns]')
+    ns = series.to_numpy().view('i8')
+    edge = series.notna().to_numpy() & (ns % _NS // 10**9 == 3_599)
+    if edge.any():
+        ns = np.where(edge, ns + 10**9, ns)
+        series = pd.Series(ns.view('datetime64[ns]'), index=series.index, name=series.name)
+    return series
@@ -0,0 +1,190 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from utils.time_utils import parse_time, is_normalized
+
+"""
+The dataset sorted once by (id, time) and kept as plain column arrays,
+so every feature function can reuse the same sort, the same time parsing
+and the same group boundaries instead of doing its own copy/sort/groupby.
+"""
+
+class TrajectoryFrame:
+    def __init__(self,id_col,time_col,ids,offsets,arrays):
+        self.id_col = id_col
+        self.time_col = time_col
+        #id of every group in sorted order
+        self.ids = ids
+        #rows of group g are offsets[g]:offsets[g+1]
+        self.offsets = offsets
+        #column name -> sorted array (the time column is datetime64[ns])
+        self.arrays = arrays
+        self._time_diff = None
+        self._data = None
+
+    @classmethod
+    def from_dataframe(cls,df,id_col,time_col,columns=None,time_format=None):
+        """
+        columns: the columns to keep next to id/time (default: all of them)
+        time_format: passed to parse_time, not used if the time column is already normalized
+        Returns df untouched if it's already a TrajectoryFrame.
+        """
+        if isinstance(df, cls):
+            return df
+        for col in (id_col,time_col):
+            if col not in df.columns:
+                raise ValueError(f'{col} not in the dataset')
+        if columns is None:
+            columns = list(df.columns)
+        columns = [col for col in dict.fromkeys(columns) if col in df.columns and col not in (id_col,time_col)]
+
+        times = df[time_col] if is_normalized(df,time_col) else parse_time(df[time_col],time_format)
+        times = _to_datetime64(times)
+        #categorical ids factorize from their codes, rows without id are left out of the order
+        #(no filtered copy of df, every kept column is gathered once below)
+        codes, uniques = pd.factorize(df[id_col], sort=True)
+        order = np.lexsort((times.view('i8'), codes))
+        if len(codes) and codes[order[0]] < 0:
+            order = order[np.count_nonzero(codes < 0):]
+        codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=np.int64)
+        offsets = np.r_[starts, len(codes)].astype(np.int64)
+
+        arrays = {time_col: times[order]}
+        for col in columns:
+            arrays[col] = df[col].to_numpy()[order]
+        return cls(id_col,time_col,np.asarray(uniques)[codes[starts]],offsets,arrays)
+
+    def save(self,directory,key=None):
+        """
+        Writes the frame as one .npy file per array plus meta.json, so load can memory-map it.
+        key: any string (e.g. a fingerprint of the source file) that load checks
+        """
+        tmp = directory.rstrip(os.sep) + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        arrays = {'__ids__': self.ids, '__offsets__': self.offsets, **self.arrays}
+        names, text = [], []
+        for i, (col, values) in enumerate(arrays.items()):
+            if values.dtype == object:
+                #strings are stored fixed width, .npy can't memory-map objects
+                values = values.astype(str)
+                text.append(col)
+            np.save(os.path.join(tmp, f'{i}.npy'), np.ascontiguousarray(values), allow_pickle=False)
+            names.append(col)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'id_col': self.id_col, 'time_col': self.time_col, 'columns': names,
+                       'text': text, 'key': key}, f)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp, directory)
+
+    @classmethod
+    def load(cls,directory,key=None,mmap_mode='r'):
+        """
+        Frame written by save, the arrays memory-mapped (read only by default).
+        Returns None if there is none or it was saved with another key.
+        """
+        try:
+            with open(os.path.join(directory, 'meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta['key'] != key:
+            return None
+        arrays = {}
+        for i, col in enumerate(meta['columns']):
+            values = np.load(os.path.join(directory, f'{i}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+            arrays[col] = values.astype(object) if col in meta['text'] else values
+        ids, offsets = arrays.pop('__ids__'), np.asarray(arrays.pop('__offsets__'))
+        return cls(meta['id_col'], meta['time_col'], ids, offsets, arrays)
+
+    @property
+    def columns(self):
+        return [self.id_col, *self.arrays]
+
+    @property
+    def n_groups(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_rows(self):
+        return int(self.offsets[-1])
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def starts(self):
+        return self.offsets[:-1]
+
+    @property
+    def ends(self):
+        return self.offsets[1:]
+
+    @property
+    def counts(self):
+        return np.diff(self.offsets)
+
+    @property
+    def group_index(self):
+        return np.repeat(np.arange(self.n_groups), self.counts)
+
+    @property
+    def is_start(self):
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.starts] = True
+        return mask
+
+    @property
+    def times(self):
+        #int64 nanoseconds since epoch
+        return self.arrays[self.time_col].view('i8')
+
+    @property
+    def time_diff(self):
+        #int64 nanoseconds since the previous ping of the same id (0 for the first ping)
+        if self._time_diff is None:
+            diff = np.zeros(self.n_rows, dtype=np.int64)
+            if self.n_rows > 1:
+                diff[1:] = np.diff(self.times)
+            diff[self.starts] = 0
+            self._time_diff = diff
+        return self._time_diff
+
+    def select(self,groups):
+        """
+        Frame with only the given groups (positions, not ids), in that order.
+        One group is a plain slice of the arrays (views, no copy).
+        """
+        groups = np.atleast_1d(groups)
+        starts, ends = self.starts[groups], self.ends[groups]
+        lengths = ends - starts
+        if len(groups) == 1:
+            rows = slice(starts[0], ends[0])
+        else:
+            rows = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+        offsets = np.r_[0, np.cumsum(lengths)].astype(np.int64)
+        arrays = {col: values[rows] for col, values in self.arrays.items()}
+        return TrajectoryFrame(self.id_col,self.time_col,self.ids[groups],offsets,arrays)
+
+    def __getitem__(self,col):
+        if col == self.id_col:
+            return np.repeat(self.ids, self.counts)
+        return self.arrays[col]
+
+    @property
+    def data(self):
+        #sorted DataFrame view of the frame, for code that still needs pandas
+        if self._data is None:
+            data = {self.id_col: self[self.id_col]}
+            data.update(self.arrays)
+            self._data = pd.DataFrame(data, copy=False)
+        return self._data
+
+
+def _to_datetime64(series):
+    if getattr(series.dt, 'tz', None) is not None:
+        series = series.dt.tz_convert(None)
+    return series.to_numpy(dtype='datetime64[ns]')